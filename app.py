@@ -5,6 +5,12 @@ import time
 # IMPORTY TWOICH MODUŁÓW
 import database as db
 import services as srv
+import importer as imp
+import phones
+import segments as seg
+import campaign_queue as cq
+from progress import ProgressReporter
+from metrics import metrics
 
 # --- KONFIGURACJA UI ---
 st.set_page_config(page_title="Beauty SaaS", page_icon="💅", layout="wide")
@@ -17,11 +23,14 @@ st.markdown("""
 
 # --- STAN SESJI ---
 if 'user' not in st.session_state: st.session_state['user'] = None
+if 'db_session' not in st.session_state: st.session_state['db_session'] = None
 if 'sms_preview' not in st.session_state: st.session_state['sms_preview'] = None
 if 'campaign_goal' not in st.session_state: st.session_state['campaign_goal'] = ""
 if 'salon_name' not in st.session_state: st.session_state['salon_name'] = ""
 if 'sms_table_key' not in st.session_state: st.session_state['sms_table_key'] = 0
 if 'sms_select_all' not in st.session_state: st.session_state['sms_select_all'] = False
+if 'client_page' not in st.session_state: st.session_state['client_page'] = 0
+if 'client_page_cursors' not in st.session_state: st.session_state['client_page_cursors'] = [None]
 
 # ========================================================
 # 1. LOGOWANIE / REJESTRACJA
@@ -36,9 +45,10 @@ if not st.session_state['user']:
             l_email = st.text_input("Email", key="l1")
             l_pass = st.text_input("Hasło", type="password", key="l2")
             if st.button("Zaloguj się", type="primary"):
-                user = db.login_user(l_email, l_pass)
+                user, session = db.login_user(l_email, l_pass)
                 if user:
                     st.session_state['user'] = user
+                    st.session_state['db_session'] = session
                     st.session_state['salon_name'] = db.get_salon_name(user.id)
                     st.rerun()
 
@@ -48,8 +58,11 @@ if not st.session_state['user']:
             r_salon = st.text_input("Nazwa Salonu")
             if st.button("Załóż konto"):
                 if r_email and r_pass and r_salon:
-                    user = db.register_user(r_email, r_pass, r_salon)
-                    if user:
+                    user, session = db.register_user(r_email, r_pass, r_salon)
+                    if user and not session:
+                        st.info("Konto utworzone! Potwierdź adres email i zaloguj się.")
+                    elif user:
+                        st.session_state['db_session'] = session
                         st.session_state['user'] = user
                         st.session_state['salon_name'] = r_salon
                         st.success("Konto utworzone!")
@@ -62,6 +75,12 @@ if not st.session_state['user']:
 # ========================================================
 # 2. APLIKACJA GŁÓWNA
 # ========================================================
+# Własny klient Supabase tej sesji (pula w database.py) dla wszystkich zapytań w tym przebiegu
+st.session_state['db_session'] = db.use_session(st.session_state['db_session'])
+if st.session_state['db_session'] is None:
+    st.session_state['user'] = None
+    st.rerun()
+
 CURRENT_USER = st.session_state['user']
 SALON_ID = CURRENT_USER.id 
 
@@ -69,10 +88,47 @@ SALON_ID = CURRENT_USER.id
 with st.sidebar:
     st.header(f"🏠 {st.session_state.get('salon_name', 'Twój Salon')}")
     st.caption(f"Zalogowany: {CURRENT_USER.email}")
+    cache_stats = db.get_clients_cache_stats()
+    st.caption(f"Cache bazy: {cache_stats['hits']} trafień / {cache_stats['delta_syncs']} synchronizacji zmian / "
+               f"{cache_stats['misses']} pobrań")
+
+    # PANEL ADMINA: czasy wywołań Supabase / Gemini / SMSAPI (metrics.py)
+    try:
+        admin_emails = st.secrets.get("ADMIN_EMAILS", [])
+    except Exception:
+        admin_emails = []
+    # Lista albo tekst "a@x.pl, b@y.pl" - porównujemy całe adresy, nie fragmenty tekstu
+    if isinstance(admin_emails, str): admin_emails = admin_emails.replace(";", ",").split(",")
+    admin_emails = {str(e).strip().lower() for e in admin_emails if str(e).strip()}
+    if (CURRENT_USER.email or "").strip().lower() in admin_emails:
+        with st.expander("📈 Statystyki wywołań"):
+            pool_stats = db.get_session_pool_stats()
+            if pool_stats:
+                st.caption(f"Pula klientów Supabase: {pool_stats['sesje']} sesji, "
+                           f"{pool_stats['odtworzone']} odtworzonych, {pool_stats['usunięte']} usuniętych")
+            kampanie = metrics.campaigns()
+            wybor = st.selectbox("Kampania:", ["(wszystko)", "(poza kampaniami)"] + kampanie)
+            campaign = None if wybor == "(wszystko)" else "" if wybor == "(poza kampaniami)" else wybor
+            stats_rows = metrics.summary(campaign)
+            if stats_rows:
+                st.dataframe(pd.DataFrame(stats_rows).drop(columns="kampania"), hide_index=True)
+            else:
+                st.caption("Brak pomiarów.")
+
+            prom_text = metrics.prometheus_text()
+            st.download_button("⬇️ Pobierz (Prometheus)", prom_text, file_name="metrics.prom", mime="text/plain")
+            if st.button("💾 Zapisz metrics.prom na serwerze"):
+                try:
+                    prom_path = st.secrets.get("METRICS_PROM_PATH", "metrics.prom")
+                except Exception:
+                    prom_path = "metrics.prom"
+                metrics.write_prometheus(prom_path)
+                st.toast(f"Zapisano {prom_path}")
     
     if st.button("Wyloguj"):
-        db.logout_user()
+        db.logout_user(st.session_state['db_session'])
         st.session_state['user'] = None
+        st.session_state['db_session'] = None
         st.rerun()
 
 st.title("Panel Salonu")
@@ -109,31 +165,32 @@ with tabs[0]:
             uploaded_file = st.file_uploader("Wgraj plik", type=['xlsx', 'csv', 'vcf'])
             
             if uploaded_file:
-                df_import = None
-                if uploaded_file.name.endswith('.vcf'):
-                    df_import = srv.parse_vcf(uploaded_file.getvalue())
-                elif uploaded_file.name.endswith('.csv'):
-                    df_import = pd.read_csv(uploaded_file)
-                else:
-                    df_import = pd.read_excel(uploaded_file)
-                
-                if df_import is not None and not df_import.empty:
-                    df_import.columns = [c.lower() for c in df_import.columns]
-                    col_imie = next((c for c in df_import.columns if 'imi' in c or 'name' in c), None)
-                    col_tel = next((c for c in df_import.columns if 'tel' in c or 'num' in c), None)
-
-                    if col_imie and col_tel:
-                        # Próba znalezienia kolumny z zabiegiem
-                        col_zabieg = next((c for c in df_import.columns if 'zabieg' in c or 'usluga' in c or 'service' in c), None)
-                        
-                        # Jeśli jest kolumna - bierzemy z niej dane. Jeśli nie - wpisujemy "Brak".
-                        wartosci_zabieg = df_import[col_zabieg] if col_zabieg else "Brak"
+                cols = imp.detect_columns(imp.read_columns(uploaded_file))
+
+                if cols["imie"] and cols["telefon"]:
+                    dup_mode = st.radio(
+                        "Numery, które już są w bazie:",
+                        ["Pomiń duplikaty", "Zaktualizuj istniejące"],
+                        horizontal=True
+                    )
+                    on_duplicate = "update" if dup_mode == "Zaktualizuj istniejące" else "skip"
+
+                    # Podsumowanie liczymy raz na plik, a nie przy każdym rerunie
+                    summary_key = f"import_summary_{getattr(uploaded_file, 'file_id', uploaded_file.name)}"
+                    if summary_key not in st.session_state:
+                        st.session_state[summary_key] = imp.summarize(uploaded_file, cols)
+                    summary = st.session_state[summary_key]
 
+                    if summary["rows"] == 0:
+                        st.warning("Plik jest pusty.")
+
+                    elif summary["rows"] <= imp.EDITOR_ROW_LIMIT:
+                        df_small = pd.concat(imp.iter_chunks(uploaded_file, cols), ignore_index=True)
                         df_to_show = pd.DataFrame({
                             "Dodaj": True, 
-                            "Imię": df_import[col_imie],
-                            "Telefon": df_import[col_tel].astype(str),
-                            "Zabieg": wartosci_zabieg 
+                            "Imię": df_small["imie"],
+                            "Telefon": "+" + df_small["kierunkowy"] + df_small["telefon"],
+                            "Zabieg": df_small["ostatni_zabieg"]
                         })
                         
                         st.info("Sprawdź dane. Możesz edytować tabelę poniżej przed zapisem.")
@@ -147,47 +204,102 @@ with tabs[0]:
                                 st.warning("Nikogo nie zaznaczono.")
                             else:
                                 prog_bar = st.progress(0.0)
-                                added_count = 0
-                                for idx, row in to_import.iterrows():
-                                    tel_raw = str(row["Telefon"])
-                                    success, _ = db.add_client(SALON_ID, str(row["Imię"]), tel_raw, str(row["Zabieg"]), None)
-                                    if success: added_count += 1
-                                    prog_bar.progress(min((idx + 1) / len(to_import), 1.0))
+                                df_db = pd.DataFrame({
+                                    "imie": to_import["Imię"].astype(str),
+                                    "telefon": to_import["Telefon"].astype(str),
+                                    "ostatni_zabieg": to_import["Zabieg"].astype(str),
+                                })
+                                wyniki = db.add_clients_bulk(
+                                    SALON_ID, df_db,
+                                    on_progress=lambda done, total: prog_bar.progress(min(done / total, 1.0)),
+                                    on_duplicate=on_duplicate
+                                )
+                                counts = db.count_bulk_results(wyniki)
                                 
-                                st.success(f"✅ Dodano {added_count} kontaktów!")
+                                st.success(f"✅ {imp.format_result(counts)}")
+                                if counts["failed"]: st.warning(f"Nie udało się zapisać {counts['failed']} kontaktów.")
                                 time.sleep(1.5)
                                 st.rerun()
+
                     else:
-                        st.error("Nie znaleziono kolumn 'Imię' i 'Telefon' w pliku.")
+                        # Duży plik: zamiast edytora - próbka i liczniki, zapis paczkami
+                        st.info(
+                            f"Plik ma {summary['rows']} wierszy: {summary['valid']} poprawnych, "
+                            f"{summary['invalid_phone']} bez poprawnego telefonu, {summary['missing_name']} bez imienia. "
+                            f"Poniżej pierwsze {len(summary['sample'])} wierszy."
+                        )
+                        st.dataframe(summary["sample"], hide_index=True, use_container_width=True)
+
+                        if st.button(f"💾 Zapisz wszystkie poprawne ({summary['valid']})"):
+                            import_progress = ProgressReporter(summary["rows"], st.progress(0.0), label="Zapisano wierszy:")
+                            counts = imp.import_file(
+                                SALON_ID, uploaded_file, cols,
+                                on_progress=import_progress.update,
+                                on_duplicate=on_duplicate
+                            )
+                            st.success(f"✅ {imp.format_result(counts)}")
+                            if counts["failed"]: st.warning(f"Nie udało się zapisać {counts['failed']} kontaktów.")
+                            time.sleep(1.5)
+                            st.rerun()
+                else:
+                    st.error("Nie znaleziono kolumn 'Imię' i 'Telefon' w pliku.")
 
     # --- C. TABELA (PEŁNA EDYCJA + CHECKBOXY) ---
     st.divider()
     st.subheader("Lista Klientek")
     
-    df = db.get_clients(SALON_ID)
+    def reset_client_pages():
+        st.session_state['client_page'] = 0
+        st.session_state['client_page_cursors'] = [None]
+
+    # Stronicowanie po stronie bazy: pobieramy tylko bieżącą stronę (kursor = ostatnie id poprzedniej)
+    page_size = st.selectbox("Klientek na stronie", [25, 50, 100, 200], index=1, key="client_page_size", on_change=reset_client_pages)
+    page = st.session_state['client_page']
+    cursors = st.session_state['client_page_cursors']
+
+    df = db.get_clients_page(SALON_ID, after_id=cursors[page], page_size=page_size)
+
+    if df.empty and page > 0:
+        # Np. po usunięciu wszystkich osób z ostatniej strony
+        reset_client_pages()
+        st.rerun()
     
     if not df.empty:
-        cols = ['id', 'imie', 'telefon', 'ostatni_zabieg']
-        df = df[[c for c in cols if c in df.columns]]
+        total_clients = db.count_clients(SALON_ID)
+        total_pages = max(1, -(-total_clients // page_size))
+
+        col_prev, col_info, col_next = st.columns([1, 2, 1])
+        if col_prev.button("⬅️ Poprzednia", disabled=page == 0):
+            st.session_state['client_page'] = page - 1
+            st.rerun()
+        col_info.caption(f"Strona {page + 1} z {total_pages} · klientek: {total_clients}")
+        if col_next.button("Następna ➡️", disabled=len(df) < page_size):
+            st.session_state['client_page_cursors'] = cursors[:page + 1] + [df["id"].tolist()[-1]]
+            st.session_state['client_page'] = page + 1
+            st.rerun()
+
         df.insert(0, "Usuń", False)
 
         st.caption("📝 Kliknij w imię/telefon, żeby edytować. Zaznacz 'Usuń', żeby skasować.")
         
         edited_table = st.data_editor(
             df,
-            key="main_client_table",
+            key=f"main_client_table_{page}_{page_size}",
             num_rows="fixed",
             use_container_width=True,
             hide_index=True,
             column_config={
                 "Usuń": st.column_config.CheckboxColumn("Usuń", default=False, width="small"),
                 "id": None, 
+                "kierunkowy": None,
                 "imie": st.column_config.TextColumn("Imię i Nazwisko", required=True),
                 "telefon": st.column_config.TextColumn("Telefon", required=True),
                 "ostatni_zabieg": "Ostatni Zabieg"
             }
         )
         
+        archive_mode = st.checkbox("🗄️ Archiwizuj zamiast usuwać (trwałe kasowanie później)", value=True)
+
         if st.button("💾 ZAPISZ WSZYSTKIE ZMIANY", type="primary"):
             try:
                 to_delete = edited_table[edited_table["Usuń"] == True]
@@ -196,24 +308,22 @@ with tabs[0]:
 
                 if not to_delete.empty:
                     ids_to_del = to_delete["id"].tolist()
-                    db.delete_clients_by_ids(ids_to_del, SALON_ID)
-                    st.toast(f"🗑️ Usunięto {len(ids_to_del)} osób.")
-                    changes_made = True
+                    del_counts = db.delete_clients_by_ids(ids_to_del, SALON_ID, archive=archive_mode)
+                    msg = db.format_delete_result(del_counts, archive=archive_mode)
+                    if del_counts["failed"]: st.error(f"🗑️ {msg} {del_counts['errors'][0]}")
+                    else: st.toast(f"🗑️ {msg}")
+                    changes_made = del_counts["deleted"] > 0
 
                 if not to_update.empty:
-                    data_to_upsert = []
-                    for index, row in to_update.iterrows():
-                        clean_row = {
-                            "id": row["id"], 
-                            "salon_id": SALON_ID,
-                            "imie": row["imie"],
-                            "telefon": ''.join(filter(str.isdigit, str(row["telefon"]))), 
-                            "ostatni_zabieg": row["ostatni_zabieg"]
-                        }
-                        data_to_upsert.append(clean_row)
-                    
-                    if data_to_upsert:
-                        db.update_clients_bulk(data_to_upsert)
+                    # Wysyłamy tylko wiersze, które faktycznie zmieniono w edytorze
+                    changed = srv.changed_client_rows(df, to_update)
+                    bad_phones = changed[~changed["telefon_ok"]]
+                    if not bad_phones.empty:
+                        st.warning(f"Pominięto {len(bad_phones)} osób z błędnym numerem: {', '.join(bad_phones['imie'].astype(str))}")
+                    changed = changed[changed["telefon_ok"]].drop(columns="telefon_ok")
+                    if not changed.empty:
+                        changed["salon_id"] = SALON_ID
+                        db.update_clients_bulk(changed.to_dict("records"))
                         changes_made = True
 
                 if changes_made:
@@ -225,6 +335,11 @@ with tabs[0]:
 
             except Exception as e:
                 st.error(f"Błąd zapisu: {e}")
+
+        if st.button("🧹 Wyczyść archiwum (starsze niż 30 dni)"):
+            ok, result = db.purge_archived_clients(SALON_ID, older_than_days=30)
+            if ok: st.toast(f"🧹 Trwale usunięto {result} zarchiwizowanych osób.")
+            else: st.error(f"Błąd czyszczenia archiwum: {result}")
     else:
         st.info("Baza jest pusta. Dodaj kogoś powyżej.")
 
@@ -234,41 +349,78 @@ with tabs[0]:
 with tabs[1]:
     st.header("Wysyłka Kampanii")
 
-    df_sms = db.get_clients(SALON_ID)
-
-    if df_sms.empty:
+    if db.count_clients(SALON_ID) == 0:
         st.warning("Najpierw dodaj klientki w zakładce Baza!")
     else:
         # 1. WYBÓR ODBIORCÓW
         st.subheader("Krok 1: Wybierz Odbiorców")
-        
-        col_all, col_none, col_space = st.columns([1, 1, 3])
-        if col_all.button("✅ Zaznacz wszystkich"):
-            st.session_state['sms_select_all'] = True
-            st.session_state['sms_table_key'] += 1
-            st.rerun()
 
-        if col_none.button("❌ Odznacz wszystkich"):
-            st.session_state['sms_select_all'] = False
-            st.session_state['sms_table_key'] += 1
-            st.rerun()
+        audience_mode = st.radio("Sposób wyboru:", ["🎯 Segment (filtry)", "✋ Ręcznie z listy"], horizontal=True)
+
+        if "Segment" in audience_mode:
+            # Filtry liczy baza - do przeglądarki nie wysyłamy listy klientek
+            saved = seg.list_segments(SALON_ID)
+            saved_by_name = {s["nazwa"]: s for s in saved}
+            chosen = st.selectbox("Zapisany segment:", ["(nowy)"] + list(saved_by_name))
+            base = saved_by_name[chosen]["filtry"] if chosen in saved_by_name else {}
+
+            f1, f2, f3 = st.columns(3)
+            seg_zabieg = f1.text_input("Ostatni zabieg zawiera:", value=base.get("zabieg", ""), key=f"seg_zabieg_{chosen}")
+            seg_dni = f2.number_input("Nie było od (dni):", min_value=0, step=10,
+                                      value=int(base.get("nie_bylo_dni") or 0), key=f"seg_dni_{chosen}")
+            seg_kier = f3.multiselect("Kierunkowe:", phones.COUNTRY_CODES,
+                                      default=base.get("kierunkowe", []), key=f"seg_kier_{chosen}")
+            seg_bez_daty = st.checkbox("Uwzględnij klientki bez daty wizyty", value=bool(base.get("bez_daty")),
+                                       key=f"seg_bez_daty_{chosen}", disabled=not seg_dni)
+            filters = {"zabieg": seg_zabieg.strip(), "nie_bylo_dni": int(seg_dni),
+                       "bez_daty": seg_bez_daty, "kierunkowe": seg_kier}
+
+            count = seg.count_segment(SALON_ID, filters)
+            st.info(f"🎯 {seg.describe(filters)} — pasuje: {count} osób")
+
+            s1, s2 = st.columns([3, 1])
+            seg_name = s1.text_input("Nazwa segmentu:", value="" if chosen == "(nowy)" else chosen)
+            if s2.button("💾 Zapisz segment"):
+                ok, msg = seg.save_segment(SALON_ID, seg_name, filters)
+                if ok: st.toast(msg); time.sleep(0.5); st.rerun()
+                else: st.error(msg)
+            if chosen in saved_by_name and s2.button("🗑️ Usuń segment"):
+                ok, msg = seg.delete_segment(saved_by_name[chosen]["id"], SALON_ID)
+                if ok: st.toast(msg); time.sleep(0.5); st.rerun()
+                else: st.error(msg)
+
+            # Wiersze segmentu pobieramy dopiero przy weryfikacji/wysyłce i trzymamy do zmiany filtrów
+            targets = None
+        else:
+            df_sms = db.get_clients(SALON_ID)
+
+            col_all, col_none, col_space = st.columns([1, 1, 3])
+            if col_all.button("✅ Zaznacz wszystkich"):
+                st.session_state['sms_select_all'] = True
+                st.session_state['sms_table_key'] += 1
+                st.rerun()
+
+            if col_none.button("❌ Odznacz wszystkich"):
+                st.session_state['sms_select_all'] = False
+                st.session_state['sms_table_key'] += 1
+                st.rerun()
+                
+            df_sms.insert(0, "Wybierz", st.session_state['sms_select_all'])
             
-        df_sms.insert(0, "Wybierz", st.session_state['sms_select_all'])
-        
-        edited_sms = st.data_editor(
-            df_sms,
-            key=f"sms_editor_{st.session_state['sms_table_key']}",
-            height=200,
-            use_container_width=True,
-            hide_index=True,
-            column_config={
-                "Wybierz": st.column_config.CheckboxColumn(default=False),
-                "id": None, "salon_id": None, "created_at": None, "kierunkowy": None, "data_wizyty": None
-            }
-        )
-        
-        targets = edited_sms[edited_sms["Wybierz"] == True]
-        count = len(targets)
+            edited_sms = st.data_editor(
+                df_sms,
+                key=f"sms_editor_{st.session_state['sms_table_key']}",
+                height=200,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "Wybierz": st.column_config.CheckboxColumn(default=False),
+                    "id": None, "salon_id": None, "created_at": None, "kierunkowy": None, "data_wizyty": None
+                }
+            )
+            
+            targets = edited_sms[edited_sms["Wybierz"] == True]
+            count = len(targets)
         
         if count > 0:
             st.success(f"Wybrano: {count} osób")
@@ -292,6 +444,8 @@ with tabs[1]:
             )
             use_unique_mode = "Unikalne" in mode_type
             
+            new_version = st.checkbox("🔄 Nowa wersja treści (pomiń zapamiętaną)", value=False)
+            
             if st.button("✨ GENERUJ PODGLĄD", type="primary"):
                 if goal:
                     # Generujemy podgląd. Jeśli tryb unikalny, generujemy przykład.
@@ -299,9 +453,13 @@ with tabs[1]:
                         st.session_state['salon_name'], 
                         {}, 
                         goal,
-                        generate_template=not use_unique_mode # Jeśli unikalne, to NIE szablon
+                        generate_template=not use_unique_mode, # Jeśli unikalne, to NIE szablon
+                        use_cache=not new_version
                     )
-                    st.session_state['sms_preview'] = content
+                    if srv.is_ai_error(content):
+                        st.error(f"Nie udało się wygenerować treści. Spróbuj ponownie. ({content})")
+                    else:
+                        st.session_state['sms_preview'] = content
                 else:
                     st.warning("Wpisz cel kampanii.")
 
@@ -320,13 +478,33 @@ with tabs[1]:
                 )
                 st.session_state['sms_preview'] = final_content
 
+                if targets is None:
+                    seg_key = repr((sorted(filters.items()), count))  # zmiana w bazie = inna liczba
+                    if st.session_state.get('segment_key') != seg_key:
+                        st.session_state['segment_targets'] = seg.fetch_segment(SALON_ID, filters)
+                        st.session_state['segment_key'] = seg_key
+                    targets = st.session_state['segment_targets']
+
+                # Szacunek kosztu: w trybie szablonu dokładnie, w unikalnym na podstawie przykładu
+                # (duplikaty numerów i tak zostaną pominięte przy wysyłce)
+                unique_targets = targets[~phones.full_numbers(targets).duplicated()]
+                dup_count = count - len(unique_targets)
+                if use_unique_mode:
+                    est_msgs = pd.Series([final_content] * len(unique_targets))
+                else:
+                    est_msgs = unique_targets['imie'].astype(str).map(lambda n: final_content.replace("{imie}", n))
+                est = srv.estimate_campaign_cost(est_msgs)
+                st.caption(
+                    f"📊 {est['messages']} SMS · {est['segments']} części · ok. {est['cost']:.2f} zł"
+                    + (f" · pominięte duplikaty: {dup_count}" if dup_count else "")
+                )
+
                 col_test, col_real = st.columns(2)
                 
                 with col_test:
                     if st.button("🧪 Wyślij TEST (Symulacja)", use_container_width=True):
                         sending_df = targets.copy()
-                        if 'kierunkowy' not in sending_df.columns: sending_df['kierunkowy'] = '48'
-                        sending_df['full_phone'] = sending_df['kierunkowy'] + sending_df['telefon']
+                        sending_df['full_phone'] = phones.full_numbers(sending_df)
                         
                         report = srv.send_campaign_logic(
                             sending_df,
@@ -341,21 +519,60 @@ with tabs[1]:
 
                 with col_real:
                     if st.button("🚀 Wyślij WSZYSTKIM (Płatne)", type="primary", use_container_width=True):
-                        with st.status("Wysyłanie..."):
-                            sending_df = targets.copy()
-                            if 'kierunkowy' not in sending_df.columns: sending_df['kierunkowy'] = '48'
-                            sending_df['full_phone'] = sending_df['kierunkowy'] + sending_df['telefon']
-                            
-                            report = srv.send_campaign_logic(
-                                sending_df,
-                                final_content,
-                                st.session_state['campaign_goal'],
-                                is_test=False,
-                                progress_bar=st.progress(0.0),
-                                salon_name=st.session_state['salon_name'],
-                                unique_mode=use_unique_mode
-                            )
-                        st.success("Wysłano!")
-                        st.dataframe(report)
+                        # Kampania idzie do kolejki - wysyła ją worker w tle, nawet po zamknięciu karty
+                        sending_df = targets.copy()
+                        sending_df['full_phone'] = phones.full_numbers(sending_df)
+
+                        job_id = cq.get_worker().store.enqueue(
+                            SALON_ID,
+                            st.session_state['salon_name'],
+                            sending_df,
+                            final_content,
+                            st.session_state['campaign_goal'],
+                            unique_mode=use_unique_mode
+                        )
+                        st.session_state['campaign_job'] = job_id
+                        st.success(f"📬 Kampania #{job_id} dodana do kolejki. Postęp poniżej.")
         else:
-            st.info("Zaznacz przynajmniej jedną osobę w tabeli powyżej.")
+            st.info("Zaznacz przynajmniej jedną osobę w tabeli powyżej albo zmień filtry segmentu.")
+
+    # KAMPANIE W TLE - fragment odświeża się sam, bez przeładowania całej strony
+    @st.fragment(run_every="2s")
+    def campaign_jobs_panel():
+        store = cq.get_worker().store
+        jobs = store.list_jobs(SALON_ID, limit=5)
+        if not jobs: return
+
+        st.divider()
+        st.subheader("📬 Kampanie w tle")
+        for job in jobs:
+            done = job["sent"] + job["failed"]
+            c_info, c_bar, c_btn = st.columns([2, 3, 1])
+            c_info.write(f"**#{job['id']}** {cq.STATUS_LABELS.get(job['status'], job['status'])}")
+            c_bar.progress(min(done / job["total"], 1.0) if job["total"] else 1.0,
+                           text=f"{done}/{job['total']} · ✅ {job['sent']} · ❌ {job['failed']}")
+            # Koszt, oszczędność na duplikatach i trafienia cache AI (jak przy wysyłce bez kolejki)
+            c_bar.caption(store.summary_text(job["id"]))
+            if job["status"] in ("queued", "running"):
+                if c_btn.button("⛔ Anuluj", key=f"cancel_job_{job['id']}"):
+                    store.cancel(job["id"], SALON_ID)
+                    st.rerun(scope="fragment")
+            else:
+                if c_btn.button("📄 Raport", key=f"report_job_{job['id']}"):
+                    st.session_state['campaign_job'] = job["id"]
+                if job["status"] in ("failed", "cancelled") and done < job["total"]:
+                    if c_btn.button("🔁 Wznów", key=f"resume_job_{job['id']}"):
+                        store.resume(job["id"], SALON_ID)
+                        st.rerun(scope="fragment")
+                if job["failed"]:
+                    if c_btn.button("♻️ Ponów błędy", key=f"retry_job_{job['id']}"):
+                        store.retry_failed(job["id"], SALON_ID)
+                        st.rerun(scope="fragment")
+            if job["error"]: c_info.caption(job["error"])
+
+        job_id = st.session_state.get('campaign_job')
+        if job_id and any(j["id"] == job_id for j in jobs):
+            st.caption(f"Raport kampanii #{job_id}")
+            st.dataframe(store.report(job_id), use_container_width=True, hide_index=True)
+
+    campaign_jobs_panel()
@@ -0,0 +1,63 @@
+"""
+Benchmark: zimny start aplikacji - ile trwa od uruchomienia nowego procesu Pythona
+do wyrenderowania ekranu logowania (app.py przez streamlit.testing AppTest, bez sieci:
+przed zalogowaniem aplikacja nie łączy się z Supabase, Gemini ani SMSAPI).
+
+Każdy pomiar to osobny proces (puste sys.modules, jak po restarcie serwera). Osobno:
+- import modułów aplikacji (database, services, importer, ...),
+- pierwsze wyrenderowanie app.py (ekran logowania),
+- które ciężkie SDK zostały zaimportowane po drodze (powinny dopiero przy pierwszym użyciu).
+
+Uruchomienie (z katalogu głównego repo):
+    python benchmarks/bench_cold_start.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+HEAVY_SDKS = ["google.generativeai", "supabase", "smsapi", "openpyxl"]
+
+PROBE = r"""
+import json, logging, sys, time
+t0 = time.perf_counter()
+import database, services, importer, segments, campaign_queue
+t_import = time.perf_counter() - t0
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=60).run()
+t_login = time.perf_counter() - t1
+print(json.dumps({
+    "import_s": t_import,
+    "login_page_s": t_login,
+    "total_s": time.perf_counter() - t0,
+    "login_rendered": any(t.value == "💅 Beauty Manager" for t in at.title),
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_SDKS,)
+
+
+def measure():
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    for key in ("import_s", "login_page_s", "total_s"):
+        values = [r[key] for r in runs]
+        print(f"{key:>14}: mediana {statistics.median(values) * 1000:7.0f} ms  (min {min(values) * 1000:.0f} ms)")
+    print(f"{'login':>14}: {'OK' if all(r['login_rendered'] for r in runs) else 'NIE WYRENDEROWANO'}")
+    print(f"{'SDK w pamięci':>14}: {', '.join(runs[-1]['loaded']) or 'żadne'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Benchmark skalowania całej aplikacji bez sieci: database.supabase, services.model i klient SMSAPI
+są podmienione na atrapy z benchmarks/fakes.py (z konfigurowalnym opóźnieniem i odsetkiem błędów).
+
+Scenariusze (dla każdej liczby klientek):
+    parse_vcf, import_csv, get_clients, update_clients_bulk, campaign_template, campaign_unique
+
+Dla każdego: czas, tempo (klientek/s), percentyle wywołań zewnętrznych (metrics.py)
+i szczytowa pamięć (tracemalloc, osobny przebieg). Wynik trafia do pliku JSON, który można
+porównywać między wersjami.
+
+Uruchomienie (z katalogu głównego repo):
+    python benchmarks/bench_scaling.py --sizes 1000 10000 100000 --out bench_results.json
+    python benchmarks/bench_scaling.py --sizes 1000 --sms-latency 0.02 --error-rate 0.05
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+import database as db  # noqa: E402
+import importer as imp  # noqa: E402
+import resilience  # noqa: E402
+import services as srv  # noqa: E402
+from bench_vcf import make_vcf  # noqa: E402
+from content_cache import ContentCache  # noqa: E402
+from fakes import FakeModel, FakeSmsApiPlClient, FakeSmsClient, FakeSupabase  # noqa: E402
+from metrics import metrics  # noqa: E402
+
+SALON_ID = "bench-salon"
+SCENARIOS = ["parse_vcf", "import_csv", "get_clients", "update_clients_bulk", "campaign_template", "campaign_unique"]
+
+
+class NullProgress:
+    """Pasek postępu, który nic nie rysuje (send_campaign_logic wymaga obiektu z .progress)."""
+
+    def progress(self, *args, **kwargs): pass
+    def text(self, *args, **kwargs): pass
+
+
+class UploadedCsv(io.BytesIO):
+    """Plik jak st.file_uploader: bajty + nazwa."""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def install_fakes(args):
+    """Podmienia zewnętrzne usługi na atrapy i zdejmuje limity tempa (mierzymy kod, nie limity providera)."""
+    fakes = {
+        "supabase": FakeSupabase(latency=args.db_latency, error_rate=args.error_rate),
+        "model": FakeModel(latency=args.ai_latency, error_rate=args.error_rate),
+        "sms": FakeSmsClient(latency=args.sms_latency, error_rate=args.error_rate),
+    }
+    db.supabase = fakes["supabase"]
+    srv.model = fakes["model"]
+    srv.SmsApiPlClient = FakeSmsApiPlClient
+    srv._configured_sms_client = lambda: (fakes["sms"], None)
+    srv.content_cache = ContentCache()  # bez trafień z poprzedniego scenariusza
+    srv.SMS_RATE_LIMIT = srv.SMS_BURST = args.sms_rate
+    srv.GEMINI_RATE_LIMIT = srv.GEMINI_MAX_RATE = args.ai_rate
+    resilience.BACKOFF_CAP = args.backoff_cap
+    db.invalidate_clients_cache()
+    return fakes
+
+
+def make_csv(n):
+    df = pd.DataFrame({
+        "Imię": [f"Klientka{i}" for i in range(n)],
+        "Telefon": [f"+48 5{i:08d}" for i in range(n)],
+        "Zabieg": ["Hybryda", "Henna", "Brak", "Manicure"] * (n // 4) + ["Brak"] * (n % 4),
+    })
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def prepare(scenario, n, args):
+    """Zwraca funkcję do zmierzenia (świeże atrapy i dane dla każdego przebiegu)."""
+    fakes = install_fakes(args)
+
+    if scenario == "parse_vcf":
+        data = make_vcf(n)
+        return lambda: srv.parse_vcf(data)
+
+    if scenario == "import_csv":
+        data = make_csv(n)
+        def run():
+            upload = UploadedCsv(data, "klientki.csv")
+            cols = imp.detect_columns(imp.read_columns(upload))
+            return imp.import_file(SALON_ID, upload, cols)
+        return run
+
+    fakes["supabase"].seed_clients(SALON_ID, n)
+    if scenario == "get_clients":
+        return lambda: db.get_clients(SALON_ID, use_cache=False)
+
+    if scenario == "update_clients_bulk":
+        records = db.get_clients(SALON_ID, use_cache=False).assign(imie=lambda d: d["imie"] + " B").to_dict("records")
+        return lambda: db.update_clients_bulk(records)
+
+    targets = db.get_clients(SALON_ID, use_cache=False)
+    unique = scenario == "campaign_unique"
+    return lambda: srv.send_campaign_logic(
+        targets, "Hej {imie}, mamy wolne terminy! Salon", "Wolne terminy", is_test=False,
+        progress_bar=NullProgress(), salon_name="Salon", unique_mode=unique,
+    )
+
+
+def run_scenario(scenario, n, args):
+    fn = prepare(scenario, n, args)
+    metrics.reset()
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    calls = metrics.summary()
+
+    result = {
+        "scenario": scenario,
+        "clients": n,
+        "seconds": round(elapsed, 3),
+        "clients_per_second": round(n / elapsed, 1) if elapsed else None,
+        "calls": [{k: v for k, v in c.items() if k != "kampania"} for c in calls],
+    }
+
+    if args.memory:
+        # Pamięć w osobnym przebiegu - tracemalloc mocno spowalnia kod
+        fn = prepare(scenario, n, args)
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_mb"] = round(peak / 2**20, 1)
+    return result
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--db-latency", type=float, default=0.0, help="opóźnienie zapytania Supabase [s]")
+    parser.add_argument("--ai-latency", type=float, default=0.0, help="opóźnienie zapytania Gemini [s]")
+    parser.add_argument("--sms-latency", type=float, default=0.0, help="opóźnienie wysyłki SMSAPI [s]")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="odsetek błędów chwilowych (0..1)")
+    parser.add_argument("--sms-rate", type=float, default=1e6, help="limit SMS/s (domyślnie bez limitu)")
+    parser.add_argument("--ai-rate", type=float, default=1e6, help="limit zapytań Gemini/s (domyślnie bez limitu)")
+    parser.add_argument("--backoff-cap", type=float, default=0.05, help="maks. pauza między ponowieniami [s]")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="bez pomiaru pamięci")
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.sizes:
+        for scenario in args.scenarios:
+            result = run_scenario(scenario, n, args)
+            results.append(result)
+            print(f"{scenario:>20} {n:>7}: {result['seconds']:>8.3f} s "
+                  f"({result['clients_per_second']} /s)" + (f", {result['peak_mb']} MB" if "peak_mb" in result else ""))
+
+    report = {
+        "version": git_version(),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out",)},
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Zapisano {args.out}")
+
+
+if __name__ == "__main__":
+    main()
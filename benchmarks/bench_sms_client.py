@@ -0,0 +1,93 @@
+"""
+Benchmark: opóźnienie wysyłki jednego SMS - stary sposób (nowy SmsApiPlClient na każdy numer)
+vs. PooledSmsClient (jedna sesja HTTP z keep-alive).
+
+Zamiast prawdziwego SMSAPI stawiamy lokalny serwer HTTP, który odpowiada jak endpoint sms.do.
+
+Uruchomienie (z katalogu głównego repo):
+    python benchmarks/bench_sms_client.py --messages 300
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from smsapi.client import SmsApiPlClient  # noqa: E402
+import services as srv  # noqa: E402
+
+
+class FakeSmsApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+    delay = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        if self.delay: time.sleep(self.delay)
+        body = json.dumps({
+            "count": 1,
+            "list": [{"id": "1", "points": 0.16, "number": "48500000000", "status": "QUEUE"}]
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def measure(send_one, n):
+    latencies = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        send_one(f"48500{i:06d}", "Hej, zapraszamy do salonu!")
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    return {
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--server-delay", type=float, default=0.0, help="sztuczne opóźnienie serwera [s]")
+    args = parser.parse_args()
+
+    FakeSmsApiHandler.delay = args.server_delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSmsApiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    domain = f"http://127.0.0.1:{server.server_port}/"
+
+    def send_old(phone, message):
+        client = SmsApiPlClient(access_token="bench")
+        client.domain = domain
+        client.sms.send(to=phone, message=message)
+
+    pooled = srv.PooledSmsClient("bench", domain)
+
+    def send_pooled(phone, message):
+        pooled.send(to=phone, message=message)
+
+    results = {
+        "messages": args.messages,
+        "before_new_client_per_sms": measure(send_old, args.messages),
+        "after_pooled_client": measure(send_pooled, args.messages),
+    }
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark parsera VCF: czas i szczytowe zużycie pamięci (tracemalloc) dla syntetycznego
+pliku ze 100 tys. wizytówek - stary parser (cały plik jako jeden string) vs. strumieniowy.
+
+Uruchomienie (z katalogu głównego repo):
+    python benchmarks/bench_vcf.py --cards 100000
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import services as srv  # noqa: E402
+
+
+def make_vcf(cards):
+    """Syntetyczny eksport: mieszanka vCard 3.0 i 2.1 (QUOTED-PRINTABLE, zawijanie, kilka TEL)."""
+    buf = io.BytesIO()
+    for i in range(cards):
+        if i % 2:
+            buf.write(
+                b"BEGIN:VCARD\r\nVERSION:3.0\r\n"
+                b"FN:Klientka Numer %d Z Bardzo Dlugim Nazwiskiem Ktore Trzeba\r\n  Zawinac\r\n"
+                b"TEL;TYPE=HOME:22 %07d\r\nTEL;TYPE=CELL:+48 5%08d\r\nEND:VCARD\r\n" % (i, i, i)
+            )
+        else:
+            buf.write(
+                b"BEGIN:VCARD\r\nVERSION:2.1\r\n"
+                b"N;CHARSET=UTF-8;ENCODING=QUOTED-PRINTABLE:Kowalska;=C5=81ucja %d\r\n"
+                b"TEL;CELL;PREF:5%08d\r\nEND:VCARD\r\n" % (i, i)
+            )
+    return buf.getvalue()
+
+
+def parse_vcf_legacy(file_content):
+    """Parser sprzed zmiany - do porównania."""
+    try:
+        content = file_content.decode("utf-8")
+    except UnicodeDecodeError:
+        content = file_content.decode("latin-1")
+    contacts = []
+    current_contact = {}
+    for line in content.splitlines():
+        if line.startswith("BEGIN:VCARD"):
+            current_contact = {}
+        elif line.startswith("FN:") or line.startswith("N:"):
+            if "Imię" not in current_contact:
+                parts = line.split(":", 1)[1]
+                current_contact["Imię"] = parts.replace(";", " ").strip()
+        elif line.startswith("TEL"):
+            if "Telefon" not in current_contact:
+                number = line.split(":", 1)[1]
+                clean_number = ''.join(filter(str.isdigit, number))
+                if len(clean_number) > 9 and clean_number.startswith("48"): pass
+                elif len(clean_number) == 9: clean_number = "48" + clean_number
+                current_contact["Telefon"] = clean_number
+        elif line.startswith("END:VCARD"):
+            if "Imię" in current_contact and "Telefon" in current_contact:
+                current_contact["Ostatni Zabieg"] = "Brak"
+                contacts.append(current_contact)
+    return pd.DataFrame(contacts)
+
+
+def measure(parse, data):
+    # Czas i pamięć mierzymy w osobnych przebiegach - tracemalloc mocno spowalnia kod
+    t0 = time.perf_counter()
+    df = parse(data)
+    elapsed = time.perf_counter() - t0
+
+    tracemalloc.start()
+    parse(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rows": len(df), "seconds": round(elapsed, 3), "peak_mb": round(peak / 2**20, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=100000)
+    args = parser.parse_args()
+
+    data = make_vcf(args.cards)
+    results = {
+        "cards": args.cards,
+        "file_mb": round(len(data) / 2**20, 1),
+        "legacy": measure(parse_vcf_legacy, data),
+        "streaming": measure(srv.parse_vcf, data),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Atrapy zewnętrznych usług do benchmarków (bez sieci):
+- FakeSupabase  - w pamięci, obsługuje łańcuchy zapytań używane w database.py / segments.py,
+- FakeModel     - zamiast services.model (Gemini), odpowiada poprawnymi SMS-ami,
+- FakeSmsClient - zamiast klienta SMSAPI (PooledSmsClient), honoruje idx/check_idx.
+
+Każda atrapa ma `latency` (sekundy na wywołanie) i `error_rate` (0..1) - wtedy losowo
+zgłasza błąd chwilowy (503), który przechodzi przez normalną ścieżkę ponowień.
+"""
+import datetime
+import json
+import random
+import re
+import threading
+import time
+
+import resilience
+from metrics import metrics
+
+
+class FakeService:
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _call(self):
+        with self.lock:
+            self.calls += 1
+            fail = self.error_rate and self.random.random() < self.error_rate
+        if self.latency: time.sleep(self.latency)
+        if fail: raise resilience.ServiceError("503 Service Unavailable (fake)", 503)
+
+
+# --- SUPABASE ---
+
+class _Response:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _or_test(col, op, value):
+    if op == "is": return lambda r: r.get(col) is None
+    return lambda r: r.get(col) is not None and str(r.get(col)) < value
+
+
+class _Query:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.action = "select"
+        self.columns = None
+        self.payload = None
+        self.filters = []
+        self.order_by = None
+        self.limit_n = None
+        self.count = None
+        self.head = False
+
+    # akcje
+    def select(self, *columns, count=None, head=None):
+        cols = [c.strip() for part in columns for c in part.split(",")]
+        self.columns = None if cols == ["*"] else cols
+        self.count, self.head = count, bool(head)
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict="", **kwargs):
+        self.action, self.payload = "upsert", rows
+        return self
+
+    def update(self, values):
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # filtry
+    def _add(self, fn):
+        self.filters.append(fn)
+        return self
+
+    def eq(self, col, value): return self._add(lambda r: str(r.get(col)) == str(value))
+    def gt(self, col, value): return self._add(lambda r: r.get(col) is not None and r.get(col) > value)
+    def gte(self, col, value): return self._add(lambda r: r.get(col) is not None and str(r.get(col)) >= str(value))
+    def lt(self, col, value): return self._add(lambda r: r.get(col) is not None and str(r.get(col)) < str(value))
+    def in_(self, col, values):
+        values = {str(v) for v in values}
+        return self._add(lambda r: str(r.get(col)) in values)
+    def is_(self, col, value): return self._add(lambda r: r.get(col) is None)
+    def ilike(self, col, pattern):
+        needle = pattern.strip("%").replace(r"\%", "%").replace(r"\_", "_").lower()
+        return self._add(lambda r: needle in str(r.get(col) or "").lower())
+
+    def or_(self, expr):
+        # tylko to, czego używa segments.py: "kol.lt.X,kol.is.null"
+        tests = [_or_test(*part.split(".", 2)) for part in expr.split(",")]
+        return self._add(lambda r: any(t(r) for t in tests))
+
+    def order(self, col, desc=False):
+        self.order_by = (col, desc)
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def execute(self):
+        self.db._call()
+        with self.db.lock:
+            return self._run(self.db.tables.setdefault(self.table, {}))
+
+    def _match(self, rows):
+        return [r for r in rows.values() if all(f(r) for f in self.filters)]
+
+    def _run(self, rows):
+        # Jak trigger w bazie: znacznik zmiany przy każdym INSERT/UPDATE (ten sam format co Postgres)
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        if self.action in ("insert", "upsert"):
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            out = []
+            for item in payload:
+                row = dict(item)
+                if row.get("id") is None:
+                    self.db.next_id += 1
+                    row["id"] = self.db.next_id
+                    row.setdefault("zarchiwizowano", None)
+                rows[row["id"]] = {**rows.get(row["id"], {}), **row, "zaktualizowano": now}
+                out.append(dict(rows[row["id"]]))
+            return _Response(out)
+
+        matched = self._match(rows)
+        if self.action == "update":
+            for r in matched: r.update(self.payload, zaktualizowano=now)
+            return _Response([dict(r) for r in matched])
+        if self.action == "delete":
+            for r in matched: del rows[r["id"]]
+            return _Response([dict(r) for r in matched])
+
+        if self.order_by:
+            col, desc = self.order_by
+            matched.sort(key=lambda r: (r.get(col) is None, r.get(col)), reverse=desc)
+        count = len(matched) if self.count else None
+        if self.head: return _Response([], count)
+        if self.limit_n is not None: matched = matched[:self.limit_n]
+        if self.db.max_rows: matched = matched[:self.db.max_rows]
+        if self.columns: matched = [{c: r.get(c) for c in self.columns} for r in matched]
+        else: matched = [dict(r) for r in matched]
+        return _Response(matched, count)
+
+
+class FakeSupabase(FakeService):
+    """
+    Podstawka pod database.supabase: tabele jako słowniki id -> wiersz.
+    `max_rows` - jak PostgREST w Supabase: select nie odda więcej wierszy naraz (też bez limit()).
+    """
+
+    def __init__(self, max_rows=1000, **kwargs):
+        super().__init__(**kwargs)
+        self.max_rows = max_rows
+        self.tables = {}
+        self.next_id = 0
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def seed_clients(self, salon_id, n):
+        """n klientek salonu z unikalnymi numerami i kilkoma rodzajami zabiegów."""
+        zabiegi = ["Hybryda", "Henna brwi", "Manicure", "Pedicure", "Brak"]
+        rows = self.tables.setdefault("klientki", {})
+        for i in range(n):
+            self.next_id += 1
+            rows[self.next_id] = {
+                "id": self.next_id, "salon_id": salon_id, "imie": f"Klientka{i}",
+                "telefon": f"5{i:08d}", "kierunkowy": "48", "ostatni_zabieg": zabiegi[i % len(zabiegi)],
+                "data_wizyty": None, "zarchiwizowano": None,
+                "zaktualizowano": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            }
+
+
+# --- GEMINI ---
+
+class _ModelResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel(FakeService):
+    """services.model: dla promptu zbiorczego oddaje tablicę JSON, dla pojedynczego - jeden SMS."""
+
+    def generate_content(self, prompt):
+        self._call()
+        match = re.search(r"KLIENTKI \(JSON\):\s*(\[.*?\])\s*\n", prompt, re.S)
+        if match:
+            klientki = json.loads(match.group(1))
+            return _ModelResponse(json.dumps(
+                [{"nr": k["nr"], "sms": f"Hej {k['imie']}, mamy wolne terminy! Salon"} for k in klientki]
+            ))
+        imie = re.search(r"do klientki (\S+)\.", prompt)
+        return _ModelResponse(f"Hej {imie.group(1) if imie else '{imie}'}, zapraszamy! Salon")
+
+
+# --- SMSAPI ---
+
+class FakeSmsClient(FakeService):
+    """Zamiast PooledSmsClient: ten sam interfejs send(to, message, **params)."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sent = 0
+        self.used_idx = set()
+
+    def send(self, to, message, **params):
+        numbers = str(to).split(",")
+        # Prawdziwy PooledSmsClient mierzy się sam - atrapa robi to samo, żeby były percentyle
+        with metrics.span("smsapi.send", size=len(message) * len(numbers)):
+            return self._send(numbers, params)
+
+    def _send(self, numbers, params):
+        self._call()
+        keys = params.get("idx", "").split("|") if params.get("idx") else []
+        with self.lock:
+            if params.get("check_idx") and any(k in self.used_idx for k in keys):
+                raise resilience.ServiceError("idx already used (fake)", 200, 53)
+            self.used_idx.update(keys)
+            self.sent += len(numbers)
+        return {"count": len(numbers), "list": [{"number": n, "status": "QUEUE"} for n in numbers]}
+
+
+class FakeSmsApiPlClient:
+    """Podstawka pod services.SmsApiPlClient (sprawdzenie, czy biblioteka jest zainstalowana)."""
+
+    def __init__(self, access_token=None):
+        self.access_token = access_token
@@ -0,0 +1,363 @@
+import logging
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+import gsm7
+import phones
+import resilience
+import services as srv
+from content_cache import count_lookups
+from metrics import campaign_scope
+
+logger = logging.getLogger(__name__)
+
+# --- KOLEJKA KAMPANII ---
+# Przycisk "Wyślij WSZYSTKIM" tylko zapisuje kampanię do lokalnej bazy SQLite.
+# Wysyła ją wątek w tle (jeden na proces), paczkami, a wynik każdej osoby jest od razu
+# zapisywany - odświeżenie strony, zamknięcie karty czy restart aplikacji nie przerywa
+# kampanii, a po restarcie wysyłka rusza od pierwszej osoby bez wyniku.
+
+JOB_BATCH_SIZE = 100       # ilu odbiorców bierzemy naraz z kolejki
+WORKER_POLL_INTERVAL = 1.0  # co ile sekund wątek sprawdza, czy są nowe kampanie
+MAX_PARALLEL_JOBS = 3      # ile kampanii (różnych salonów) może iść jednocześnie
+
+# Statusy kampanii: queued -> running -> done / cancelled / failed
+# Statusy odbiorcy: pending -> sent / failed, albo skipped (duplikat numeru)
+STATUS_LABELS = {
+    "queued": "⏳ W kolejce", "running": "🚀 Wysyłanie", "done": "✅ Zakończona",
+    "cancelled": "⛔ Anulowana", "failed": "❌ Błąd",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    salon_id TEXT, salon_name TEXT, unique_mode INTEGER, template TEXT, goal TEXT,
+    status TEXT, total INTEGER, sent INTEGER DEFAULT 0, failed INTEGER DEFAULT 0,
+    error TEXT, created_at REAL, updated_at REAL,
+    cache_hits INTEGER DEFAULT 0, cache_misses INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS recipients (
+    job_id INTEGER, idx INTEGER, imie TEXT, telefon TEXT, ostatni_zabieg TEXT,
+    tresc TEXT, czesci INTEGER DEFAULT 0, status TEXT, info TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS recipients_pending ON recipients (job_id, status, idx);
+"""
+# Kolumny dodane później - pliki kolejki sprzed zmiany dostają je przez ALTER TABLE
+_ADDED_JOB_COLUMNS = {"cache_hits": "INTEGER DEFAULT 0", "cache_misses": "INTEGER DEFAULT 0"}
+
+class CampaignStore:
+    """Kampanie i ich odbiorcy w SQLite. Jedno połączenie dzielone przez wątki (pod lockiem)."""
+
+    def __init__(self, db_path):
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock:
+            # WAL: zapis wyniku po każdym SMS-ie nie blokuje odczytów postępu z UI
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript(_SCHEMA)
+            columns = {r["name"] for r in self.db.execute("PRAGMA table_info(jobs)")}
+            for name, decl in _ADDED_JOB_COLUMNS.items():
+                if name not in columns: self.db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {decl}")
+            self.db.commit()
+
+    def _query(self, sql, params=()):
+        with self.lock:
+            return [dict(r) for r in self.db.execute(sql, params).fetchall()]
+
+    def enqueue(self, salon_id, salon_name, target_df, template, goal, unique_mode=False):
+        """Zapisuje kampanię z listą odbiorców i zwraca jej id. Powtórzone numery od razu są pomijane."""
+        if "full_phone" in target_df.columns:
+            full_phones = target_df["full_phone"]
+        else:
+            full_phones = phones.full_numbers(target_df)
+        imiona = target_df["imie"].fillna("Klientko").astype(str) if "imie" in target_df.columns \
+            else pd.Series("Klientko", index=target_df.index)
+        zabiegi = target_df["ostatni_zabieg"].fillna("").astype(str) if "ostatni_zabieg" in target_df.columns \
+            else pd.Series("", index=target_df.index)
+        duplikaty = full_phones.duplicated()
+
+        # W trybie szablonu treść znamy od razu, w unikalnym powstaje dopiero w workerze
+        if unique_mode:
+            tresci = pd.Series("", index=target_df.index)
+        else:
+            tresci = gsm7.normalize_series(imiona.map(lambda imie: template.replace("{imie}", imie)))
+        czesci = gsm7.count_segments_series(tresci)
+
+        now = time.time()
+        with self.lock:
+            cur = self.db.execute(
+                "INSERT INTO jobs (salon_id, salon_name, unique_mode, template, goal, status, total, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (str(salon_id), salon_name, int(unique_mode), template, goal, int((~duplikaty).sum()), now, now),
+            )
+            job_id = cur.lastrowid
+            self.db.executemany(
+                "INSERT INTO recipients (job_id, idx, imie, telefon, ostatni_zabieg, tresc, czesci, status, info) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (job_id, i, imie, str(tel), zabieg, tresc, int(cz),
+                     "skipped" if dup else "pending", "Duplikat (pominięto)" if dup else "")
+                    for i, (imie, tel, zabieg, tresc, cz, dup)
+                    in enumerate(zip(imiona, full_phones, zabiegi, tresci, czesci, duplikaty))
+                ],
+            )
+            self.db.commit()
+        return job_id
+
+    def requeue_interrupted(self):
+        """Po restarcie procesu kampanie 'running' nie mają już wątku - wracają do kolejki."""
+        with self.lock:
+            self.db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+            self.db.commit()
+
+    def claim_next(self, busy_salons=()):
+        """Bierze najstarszą kampanię z kolejki (salonu, który nie ma już kampanii w toku)."""
+        with self.lock:
+            for row in self.db.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id").fetchall():
+                if row["salon_id"] in busy_salons: continue
+                self.db.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (time.time(), row["id"]))
+                self.db.commit()
+                return dict(row)
+        return None
+
+    def pending_batch(self, job_id, limit=JOB_BATCH_SIZE):
+        return self._query(
+            "SELECT * FROM recipients WHERE job_id = ? AND status = 'pending' ORDER BY idx LIMIT ?", (job_id, limit)
+        )
+
+    def save_contents(self, job_id, contents):
+        """Zapisuje wygenerowane treści (tryb unikalny): lista (idx, treść, części)."""
+        with self.lock:
+            self.db.executemany(
+                "UPDATE recipients SET tresc = ?, czesci = ? WHERE job_id = ? AND idx = ?",
+                [(tresc, int(cz), job_id, idx) for idx, tresc, cz in contents],
+            )
+            self.db.commit()
+
+    def record_result(self, job_id, idx, success, info):
+        """Punkt kontrolny: wynik jednej osoby trafia na dysk od razu po odpowiedzi SMSAPI."""
+        column = "sent" if success else "failed"
+        with self.lock:
+            self.db.execute(
+                "UPDATE recipients SET status = ?, info = ? WHERE job_id = ? AND idx = ?",
+                ("sent" if success else "failed", "" if success else str(info), job_id, idx),
+            )
+            self.db.execute(f"UPDATE jobs SET {column} = {column} + 1, updated_at = ? WHERE id = ?", (time.time(), job_id))
+            self.db.commit()
+
+    def add_cache_stats(self, job_id, hits, misses):
+        """Trafienia/chybienia cache treści AI tej kampanii (do podsumowania)."""
+        with self.lock:
+            self.db.execute("UPDATE jobs SET cache_hits = cache_hits + ?, cache_misses = cache_misses + ? WHERE id = ?",
+                            (hits, misses, job_id))
+            self.db.commit()
+
+    def finish(self, job_id, status, error=None):
+        with self.lock:
+            # Anulowanej w trakcie kampanii nie nadpisujemy statusem "done"
+            self.db.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ? AND status = 'running'",
+                (status, error, time.time(), job_id),
+            )
+            self.db.commit()
+
+    def cancel(self, job_id, salon_id):
+        with self.lock:
+            self.db.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE id = ? AND salon_id = ? "
+                "AND status IN ('queued', 'running')",
+                (time.time(), job_id, str(salon_id)),
+            )
+            self.db.commit()
+
+    def resume(self, job_id, salon_id):
+        """Przerwana (błąd/anulowanie) kampania wraca do kolejki - wysyłka ruszy od pierwszej osoby bez wyniku."""
+        with self.lock:
+            self.db.execute(
+                "UPDATE jobs SET status = 'queued', error = NULL, updated_at = ? WHERE id = ? AND salon_id = ? "
+                "AND status IN ('failed', 'cancelled')",
+                (time.time(), job_id, str(salon_id)),
+            )
+            self.db.commit()
+
+    def retry_failed(self, job_id, salon_id):
+        """
+        Odbiorcy z błędem wracają do kolejki, a kampania do wysyłki; zwraca ich liczbę.
+        Klucze idempotencji się nie zmieniają, więc kto mimo błędu dostał SMS, drugiego nie dostanie.
+        """
+        with self.lock:
+            job = self.db.execute(
+                "SELECT * FROM jobs WHERE id = ? AND salon_id = ? AND status IN ('done', 'failed', 'cancelled')",
+                (job_id, str(salon_id)),
+            ).fetchone()
+            if job is None: return 0
+            n = self.db.execute(
+                "UPDATE recipients SET status = 'pending', info = '' WHERE job_id = ? AND status = 'failed'", (job_id,)
+            ).rowcount
+            if job["unique_mode"]:
+                # Treść, której AI nie napisało, worker wygeneruje jeszcze raz
+                self.db.execute(
+                    "UPDATE recipients SET tresc = '', czesci = 0 WHERE job_id = ? AND status = 'pending' "
+                    "AND (tresc IS NULL OR tresc = '' OR tresc LIKE ?)",
+                    (job_id, srv.AI_ERROR_PREFIX + "%"),
+                )
+            if n:
+                self.db.execute(
+                    "UPDATE jobs SET status = 'queued', failed = failed - ?, error = NULL, updated_at = ? WHERE id = ?",
+                    (n, time.time(), job_id),
+                )
+            self.db.commit()
+        return n
+
+    def get_job(self, job_id):
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def list_jobs(self, salon_id, limit=10):
+        return self._query("SELECT * FROM jobs WHERE salon_id = ? ORDER BY id DESC LIMIT ?", (str(salon_id), limit))
+
+    def summary(self, job_id):
+        """
+        Koszt i oszczędności kampanii (jak podsumowanie send_campaign_logic): liczba SMS-ów i części,
+        szacowany koszt, pominięte duplikaty i ile to oszczędziło, trafienia cache AI.
+        W trybie unikalnym części znamy dopiero po wygenerowaniu - do tego czasu liczymy z gotowych treści.
+        """
+        job = self.get_job(job_id)
+        stats = self._query(
+            "SELECT COUNT(*) AS n, SUM(status = 'skipped') AS skipped, "
+            "SUM(CASE WHEN status != 'skipped' THEN czesci ELSE 0 END) AS czesci, "
+            "SUM(status != 'skipped' AND czesci > 0) AS z_trescia FROM recipients WHERE job_id = ?",
+            (job_id,),
+        )[0]
+        skipped, segments = stats["skipped"] or 0, stats["czesci"] or 0
+        mean_segments = segments / stats["z_trescia"] if stats["z_trescia"] else 0
+        return {
+            "messages": (stats["n"] or 0) - skipped,
+            "segments": segments,
+            "cost": round(segments * srv.SMS_SEGMENT_PRICE, 2),
+            "skipped": skipped,
+            "saved": round(skipped * mean_segments * srv.SMS_SEGMENT_PRICE, 2),
+            "cache": {"hits": job["cache_hits"], "misses": job["cache_misses"]} if job else {},
+        }
+
+    def summary_text(self, job_id):
+        s = self.summary(job_id)
+        return (f"📊 {s['messages']} SMS · {s['segments']} części · ok. {s['cost']:.2f} zł."
+                + srv.campaign_summary(s["skipped"], s["saved"], s["cache"]))
+
+    def report(self, job_id):
+        """Raport kampanii w tym samym formacie co send_campaign_logic."""
+        status_map = {"pending": "⏳ Czeka", "sent": "✅ Wysłano", "skipped": "⏭️ Duplikat (pominięto)"}
+        rows = self._query("SELECT * FROM recipients WHERE job_id = ? ORDER BY idx", (job_id,))
+        return pd.DataFrame([{
+            "Imię": r["imie"],
+            "Telefon": r["telefon"],
+            "Treść SMS": r["tresc"],
+            "Części": r["czesci"],
+            "Status": status_map.get(r["status"], f"❌ Błąd: {r['info']}"),
+        } for r in rows], columns=["Imię", "Telefon", "Treść SMS", "Części", "Status"])
+
+# --- WORKER ---
+
+def process_job(store, job, batch_size=JOB_BATCH_SIZE):
+    """Wysyła wszystkich oczekujących odbiorców kampanii paczkami; wynik każdego od razu zapisuje."""
+    job_id = job["id"]
+    # Ten sam klucz przy każdym wznowieniu - SMSAPI odrzuci SMS, który już raz wyszedł
+    campaign_id = f"{job_id}:{job['created_at']}"
+    while True:
+        current = store.get_job(job_id)
+        if current is None or current["status"] != "running": return  # anulowana
+        batch = store.pending_batch(job_id, batch_size)
+        if not batch: break
+
+        if job["unique_mode"]:
+            # Treści generujemy tylko dla tych, którzy jeszcze ich nie mają (np. po restarcie)
+            need = [r for r in batch if not r["tresc"]]
+            if need:
+                with count_lookups() as cache:
+                    messages = srv.generate_messages_parallel(
+                        job["salon_name"], [{"imie": r["imie"], "ostatni_zabieg": r["ostatni_zabieg"]} for r in need], job["goal"]
+                    )
+                store.add_cache_stats(job_id, cache["hits"], cache["misses"])
+                messages = gsm7.normalize_series(pd.Series(messages, dtype=object))
+                czesci = gsm7.count_segments_series(messages)
+                store.save_contents(job_id, [(r["idx"], m, c) for r, m, c in zip(need, messages, czesci)])
+                for r, m, c in zip(need, messages, czesci): r["tresc"], r["czesci"] = m, int(c)
+
+            # Komu AI nie napisało treści (mimo ponowień) - zapisujemy błąd i nie wysyłamy
+            for r in [r for r in batch if srv.is_ai_error(r["tresc"])]:
+                store.record_result(job_id, r["idx"], False, "Błąd AI - nie wysłano")
+            batch = [r for r in batch if not srv.is_ai_error(r["tresc"])]
+            if not batch: continue
+
+        def _on_result(i, success, info):
+            store.record_result(job_id, batch[i]["idx"], success, info)
+
+        keys = [resilience.idempotency_key(campaign_id, r["telefon"]) for r in batch]
+        if job["unique_mode"]:
+            srv.dispatch_sms([(r["telefon"], r["tresc"]) for r in batch], on_result=_on_result, keys=keys)
+        else:
+            srv.send_template_bulk([(r["telefon"], r["imie"]) for r in batch], job["template"],
+                                   on_result=_on_result, keys=keys)
+
+    store.finish(job_id, "done")
+
+class CampaignWorker:
+    """Wątek w tle: bierze kampanie z kolejki i wysyła je (do MAX_PARALLEL_JOBS naraz, po jednej na salon)."""
+
+    def __init__(self, store, max_jobs=MAX_PARALLEL_JOBS, poll_interval=WORKER_POLL_INTERVAL):
+        self.store = store
+        self.max_jobs = max_jobs
+        self.poll_interval = poll_interval
+        self.active = {}  # job_id -> salon_id
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._loop, name="campaign-worker", daemon=True)
+
+    def start(self):
+        self.store.requeue_interrupted()
+        self.thread.start()
+        return self
+
+    def _loop(self):
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Błąd kolejki kampanii")
+            time.sleep(self.poll_interval)
+
+    def poll(self):
+        """Uruchamia kolejne kampanie z kolejki, jeśli jest wolne miejsce."""
+        while True:
+            with self.lock:
+                if len(self.active) >= self.max_jobs: return
+                job = self.store.claim_next(set(self.active.values()))
+                if job is None: return
+                self.active[job["id"]] = job["salon_id"]
+            threading.Thread(target=self._run, args=(job,), name=f"campaign-{job['id']}", daemon=True).start()
+
+    def _run(self, job):
+        try:
+            with campaign_scope(f"#{job['id']} {job['salon_name']}"):
+                process_job(self.store, job)
+        except Exception as e:
+            self.store.finish(job["id"], "failed", str(e))
+        finally:
+            with self.lock:
+                self.active.pop(job["id"], None)
+
+@st.cache_resource(show_spinner=False)
+def get_worker():
+    """Jedna kolejka i jeden worker na proces. Plik bazy: secret CAMPAIGN_DB_PATH (domyślnie campaigns.db)."""
+    try:
+        db_path = st.secrets.get("CAMPAIGN_DB_PATH", "campaigns.db")
+    except Exception:
+        db_path = "campaigns.db"
+    return CampaignWorker(CampaignStore(db_path)).start()
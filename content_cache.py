@@ -0,0 +1,119 @@
+import contextvars
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# --- CACHE TREŚCI SMS ---
+# Dwa poziomy: szybki LRU w pamięci procesu + opcjonalny plik SQLite,
+# żeby wygenerowane treści przetrwały restart aplikacji.
+
+# Liczniki jednej kampanii (count_lookups) - przechodzą do wątków roboczych przez metrics.bind
+_lookups = contextvars.ContextVar("content_cache_lookups", default=None)
+
+@contextmanager
+def count_lookups():
+    """
+    with count_lookups() as c: ...  -> c["hits"], c["misses"] tylko z tego bloku,
+    nawet gdy w tym samym czasie z cache korzysta inna kampania.
+    """
+    counter = {"hits": 0, "misses": 0}
+    token = _lookups.set(counter)
+    try:
+        yield counter
+    finally:
+        _lookups.reset(token)
+
+def make_key(*parts):
+    """Klucz z znormalizowanych części (wielkość liter i nadmiarowe spacje nie mają znaczenia)."""
+    norm = [" ".join(str(p).lower().split()) if p is not None else "" for p in parts]
+    return hashlib.sha1("\x1f".join(norm).encode("utf-8")).hexdigest()
+
+class ContentCache:
+    def __init__(self, max_items=1000, ttl=7 * 24 * 3600, db_path=None, max_disk_items=50000):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.max_disk_items = max_disk_items
+        self.memory = OrderedDict()  # klucz -> (czas_zapisu, treść)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.db = None
+        if db_path:
+            try:
+                self.db = sqlite3.connect(db_path, check_same_thread=False)
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS sms_cache (key TEXT PRIMARY KEY, value TEXT, created_at REAL)"
+                )
+                self.db.commit()
+            except sqlite3.Error as e:
+                logger.warning("Cache SMS bez dysku: %s", e)
+                self.db = None
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            item = self.memory.get(key)
+            if item and now - item[0] < self.ttl:
+                self.memory.move_to_end(key)
+                self._count("hits")
+                return item[1]
+
+            if self.db is not None:
+                row = self.db.execute("SELECT value, created_at FROM sms_cache WHERE key = ?", (key,)).fetchone()
+                if row and now - row[1] < self.ttl:
+                    self._remember(key, row[0], row[1])
+                    self._count("hits")
+                    return row[0]
+
+            self._count("misses")
+            return None
+
+    def _count(self, kind):
+        setattr(self, kind, getattr(self, kind) + 1)
+        counter = _lookups.get()
+        if counter is not None: counter[kind] += 1
+
+    def set(self, key, value):
+        now = time.time()
+        with self.lock:
+            self._remember(key, value, now)
+            if self.db is not None:
+                try:
+                    self.db.execute("INSERT OR REPLACE INTO sms_cache VALUES (?, ?, ?)", (key, value, now))
+                    self.writes += 1
+                    if self.writes % 100 == 0: self._evict_disk(now)
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    logger.warning("Błąd zapisu cache SMS: %s", e)
+
+    def _remember(self, key, value, created_at):
+        self.memory[key] = (created_at, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        """Usuwa przeterminowane wpisy i najstarsze ponad limit `max_disk_items`."""
+        self.db.execute("DELETE FROM sms_cache WHERE created_at < ?", (now - self.ttl,))
+        self.db.execute(
+            "DELETE FROM sms_cache WHERE key IN ("
+            " SELECT key FROM sms_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_items,)
+        )
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "memory_items": len(self.memory),
+            }
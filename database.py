@@ -1,27 +1,182 @@
 import streamlit as st
-from supabase import create_client, Client
 import pandas as pd
+import contextvars
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import phones
+import resilience
+from metrics import metrics, bind
+
+logger = logging.getLogger(__name__)
 
 # --- INICJALIZACJA BAZY ---
-def init_supabase():
+# Klienta tworzymy dopiero przy pierwszym zapytaniu (np. logowaniu), a nie przy imporcie modułu -
+# sam import SDK supabase to kilkaset ms, a ekran logowania go nie potrzebuje.
+# Ustawienie `supabase` (np. atrapa w benchmarkach) ma pierwszeństwo przed klientami z puli.
+supabase = None
+
+@st.cache_resource(show_spinner=False)
+def get_supabase():
+    """Wspólny klient anonimowy (przed zalogowaniem: np. reset hasła) - jeden na proces."""
+    return get_session_pool().factory()
+
+# --- PULA KLIENTÓW NA SESJĘ ---
+# Każda zalogowana sesja ma własnego klienta Supabase z własnym tokenem - logowanie jednego salonu
+# nie przestawia auth pozostałym, a zapytania różnych salonów idą równolegle.
+# Kluczem jest token dostępu z chwili logowania; w st.session_state trzymamy (klucz, refresh token),
+# więc klienta usuniętego z puli da się odtworzyć bez ponownego logowania.
+# Pula ma ograniczony rozmiar (najdawniej używany wypada pierwszy) i usuwa klientów nieużywanych
+# dłużej niż SESSION_IDLE_SECONDS. Wszyscy klienci dzielą jedno httpx.Client (keep-alive do Supabase).
+
+SESSION_POOL_SIZE = 200
+SESSION_IDLE_SECONDS = 30 * 60
+HTTP_MAX_CONNECTIONS = 100
+
+# Sesja bieżącego przebiegu skryptu (use_session) - przechodzi do wątków roboczych przez metrics.bind
+_session = contextvars.ContextVar("supabase_session", default=None)
+
+class SessionClientPool:
+    def __init__(self, factory, max_size=SESSION_POOL_SIZE, idle_seconds=SESSION_IDLE_SECONDS, clock=time.monotonic):
+        self.factory = factory  # factory() -> nowy, niezalogowany klient
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self.clients = OrderedDict()  # klucz -> [klient, ostatnie użycie], od najdawniej używanego
+        self.lock = threading.Lock()
+        self.created = 0
+        self.evicted = 0
+
+    def add(self, key, client):
+        with self.lock:
+            self.clients[key] = [client, self.clock()]
+            self.clients.move_to_end(key)
+            self._evict()
+
+    def get(self, key, refresh_token=None):
+        """Klient sesji; jeśli wypadł z puli - nowy, zalogowany z (klucz, refresh_token)."""
+        with self.lock:
+            entry = self.clients.get(key)
+            if entry is not None:
+                entry[1] = self.clock()
+                self.clients.move_to_end(key)
+                return entry[0]
+        if not refresh_token:
+            raise LookupError("Sesja wygasła - zaloguj się ponownie.")
+        client = self.factory()
+        client.auth.set_session(key, refresh_token)
+        with self.lock:
+            # Dwa wątki mogły odtworzyć tę samą sesję naraz - zostaje pierwszy
+            entry = self.clients.setdefault(key, [client, self.clock()])
+            entry[1] = self.clock()
+            self.clients.move_to_end(key)
+            self.created += 1
+            self._evict()
+            return entry[0]
+
+    def pop(self, key):
+        with self.lock:
+            entry = self.clients.pop(key, None)
+        return entry[0] if entry else None
+
+    def _evict(self):
+        now = self.clock()
+        while self.clients:
+            key, (client, last_used) = next(iter(self.clients.items()))
+            if len(self.clients) <= self.max_size and now - last_used < self.idle_seconds: break
+            del self.clients[key]
+            self.evicted += 1
+
+    def stats(self):
+        with self.lock:
+            self._evict()
+            return {"sesje": len(self.clients), "odtworzone": self.created, "usunięte": self.evicted}
+
+@st.cache_resource(show_spinner=False)
+def get_session_pool():
+    """Jedna pula na proces; klienci bez własnego zapisu sesji i bez wątku auto-odświeżania tokenu."""
+    import httpx
+    from supabase import ClientOptions, create_client
     try:
         url = st.secrets["SUPABASE_URL"]
         key = st.secrets["SUPABASE_KEY"]
-        return create_client(url, key)
     except Exception as e:
         st.error(f"❌ Błąd połączenia z bazą: {e}")
         st.stop()
+    http = httpx.Client(
+        http2=True, follow_redirects=True, timeout=120,
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS),
+    )
+    options = lambda: ClientOptions(persist_session=False, auto_refresh_token=False, httpx_client=http)
+    return SessionClientPool(lambda: create_client(url, key, options=options()))
 
-supabase: Client = init_supabase()
+def _session_key(auth_session):
+    return (auth_session.access_token, auth_session.refresh_token) if auth_session else None
+
+def use_session(session):
+    """
+    Ustawia klienta sesji dla wszystkich zapytań w tym przebiegu skryptu (app.py, po zalogowaniu).
+    Przy okazji odświeża token, jeśli wygasa. Zwraca aktualne (klucz, refresh_token) do zapisania
+    w st.session_state albo None, gdy sesji nie da się już odtworzyć.
+    """
+    if not session:
+        _session.set(None)
+        return None
+    if supabase is not None:
+        _session.set(session)
+        return session
+    key, refresh_token = session
+    try:
+        auth_session = get_session_pool().get(key, refresh_token).auth.get_session()
+    except Exception as e:
+        logger.warning("Sesja Supabase nieaktualna: %s", e)
+        get_session_pool().pop(key)
+        auth_session = None
+    session = (key, auth_session.refresh_token) if auth_session else None
+    _session.set(session)
+    return session
+
+def get_client():
+    """Klient bieżącej sesji (use_session), a bez niej - wspólny klient anonimowy."""
+    if supabase is not None: return supabase
+    session = _session.get()
+    if session: return get_session_pool().get(*session)
+    return get_supabase()
+
+def get_session_pool_stats():
+    return get_session_pool().stats() if supabase is None else {}
+
+def run_query(query, name):
+    """Wykonuje zapytanie Supabase z pomiarem (metrics.py): czas, liczba wierszy, wynik."""
+    with metrics.span(f"supabase.{name}") as span:
+        res = query.execute()
+        if isinstance(res.data, list): span.size = len(res.data)
+        return res
 
 # --- LOGOWANIE I REJESTRACJA ---
+def _new_session_client():
+    return supabase if supabase is not None else get_session_pool().factory()
+
+def _start_session(client, auth_session):
+    """Wrzuca zalogowanego klienta do puli i ustawia go jako bieżący; zwraca (klucz, refresh_token)."""
+    session = _session_key(auth_session)
+    if session and supabase is None: get_session_pool().add(session[0], client)
+    _session.set(session)
+    return session
+
 def login_user(email, password):
+    """Loguje na nowym kliencie z puli. Zwraca (user, sesja) - sesję trzymamy w st.session_state."""
     try:
-        response = supabase.auth.sign_in_with_password({"email": email, "password": password})
-        return response.user
+        client = _new_session_client()
+        with metrics.span("supabase.auth.login"):
+            response = client.auth.sign_in_with_password({"email": email, "password": password})
+        return response.user, _start_session(client, response.session)
     except Exception as e:
         st.error(f"Błąd logowania: {e}")
-        return None
+        return None, None
 
 def register_user(email, password, salon_name):
     """
@@ -29,27 +184,34 @@ def register_user(email, password, salon_name):
     Resztę (tworzenie wpisu w tabeli profiles) załatwia Trigger SQL.
     """
     try:
+        client = _new_session_client()
         # Przekazujemy nazwę salonu w 'data', żeby SQL mógł ją przechwycić
-        response = supabase.auth.sign_up({
+        response = client.auth.sign_up({
             "email": email, 
             "password": password,
             "options": {
                 "data": { "full_name": salon_name, "nazwa_salonu": salon_name }
             }
         })
-        return response.user
+        # Bez sesji, jeśli projekt wymaga potwierdzenia adresu email
+        return response.user, _start_session(client, response.session)
     except Exception as e:
         st.error(f"Błąd rejestracji: {e}")
-        return None
+        return None, None
 
-def logout_user():
-    supabase.auth.sign_out()
+def logout_user(session=None):
+    session = session or _session.get()
+    _session.set(None)
+    if not session or supabase is not None: return
+    client = get_session_pool().pop(session[0])
+    if client is not None:
+        client.auth.sign_out()
 
 def reset_password_email(email):
     try:
         # Pamiętaj, żeby w panelu Supabase -> Authentication -> URL Configuration
         # ustawić Site URL na swój adres (np. http://localhost:8501 lub adres chmury)
-        supabase.auth.reset_password_for_email(email, {
+        get_client().auth.reset_password_for_email(email, {
             "redirect_to": "http://localhost:8501" 
         })
         return True, "Link wysłany! Sprawdź email."
@@ -61,7 +223,7 @@ def reset_password_email(email):
 def get_salon_name(user_id):
     """Pobiera nazwę salonu dla zalogowanego użytkownika"""
     try:
-        res = supabase.table("profiles").select("nazwa_salonu").eq("id", user_id).execute()
+        res = run_query(get_client().table("profiles").select("nazwa_salonu").eq("id", user_id), "get_salon_name")
         if res.data and len(res.data) > 0:
             return res.data[0].get("nazwa_salonu", "")
         return ""
@@ -71,59 +233,461 @@ def get_salon_name(user_id):
 def update_salon_name(user_id, new_name):
     try:
         data = {"id": user_id, "nazwa_salonu": new_name}
-        supabase.table("profiles").upsert(data).execute()
+        run_query(get_client().table("profiles").upsert(data), "update_salon_name")
         return True
     except Exception as e:
         st.error(f"Błąd zapisu profilu: {e}")
         return False
 
+# --- CACHE LISTY KLIENTEK ---
+# Streamlit odpala skrypt od nowa przy każdym kliknięciu, więc bez cache
+# każdy checkbox w tabeli pobierał całą tabelę 'klientki' (2x na rerun).
+# Trzymamy ostatni wynik per salon_id (snapshot) i synchronizujemy go przyrostowo:
+# zamiast pobierać całą tabelę, pytamy tylko o wiersze zmienione od ostatniej synchronizacji
+# (kolumna UPDATED_COLUMN), razem z zarchiwizowanymi - te wypadają ze snapshotu.
+# Wymaga kolumny ustawianej przez bazę przy każdym INSERT/UPDATE:
+#   alter table klientki add column zaktualizowano timestamptz not null default now();
+#   create index on klientki (salon_id, zaktualizowano);
+#   create function ustaw_zaktualizowano() returns trigger language plpgsql as
+#     $$ begin new.zaktualizowano = now(); return new; end $$;
+#   create trigger klientki_zaktualizowano before insert or update on klientki
+#     for each row execute function ustaw_zaktualizowano();
+# Bez tej kolumny działa jak dawniej: pełne pobranie po CLIENTS_CACHE_TTL albo po zapisie.
+
+CLIENTS_CACHE_TTL = 300  # sekundy - bez synchronizacji przyrostowej
+CLIENTS_SYNC_INTERVAL = 10  # sekundy - tyle snapshot jest podawany bez pytania bazy o zmiany
+CLIENTS_FULL_SYNC_SECONDS = 3600  # co tyle i tak pobieramy całość
+CLIENTS_DELTA_MAX_ROWS = 1000  # więcej zmian naraz - taniej pobrać całość
+# Zakładka czasu przy pytaniu o zmiany: transakcja z wcześniejszym now() może się zatwierdzić
+# już po naszej synchronizacji - te same wiersze pobrane dwa razy niczego nie psują
+CLIENTS_SYNC_OVERLAP = 5  # sekundy
+UPDATED_COLUMN = "zaktualizowano"
+
+_clients_cache = {}  # salon_id -> _Snapshot
+_clients_cache_lock = threading.Lock()
+_clients_cache_stats = {"hits": 0, "misses": 0, "delta_syncs": 0, "invalidations": 0}
+
+class _Snapshot:
+    def __init__(self, df, watermark, full_at):
+        self.df = df
+        self.watermark = watermark  # najnowszy UPDATED_COLUMN w snapshocie (albo None)
+        self.full_at = full_at
+        self.synced_at = time.time()
+        self.stale = False
+
+def invalidate_clients_cache(salon_id=None):
+    """
+    Po zapisie w salonie: następny odczyt dociągnie zmiany (przyrostowo, jeśli się da).
+    salon_id=None - czyści cały cache.
+    """
+    with _clients_cache_lock:
+        if salon_id is None:
+            _clients_cache.clear()
+        elif salon_id in _clients_cache:
+            _clients_cache[salon_id].stale = True
+        _clients_cache_stats["invalidations"] += 1
+
+def get_clients_cache_stats():
+    """Liczniki trafień/chybień cache - do podglądu na produkcji"""
+    with _clients_cache_lock:
+        stats = dict(_clients_cache_stats)
+        stats["cached_salons"] = len(_clients_cache)
+    total = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / total if total else 0.0
+    return stats
+
 # --- KLIENCI (CRUD) ---
 
-def add_client(salon_id, imie, telefon, zabieg, data, kierunkowy="48"):
-    # Czyścimy dane przed wysłaniem
-    clean_tel = ''.join(filter(str.isdigit, str(telefon)))
-    clean_kier = ''.join(filter(str.isdigit, str(kierunkowy)))
-    
+# Miękkie usuwanie: zarchiwizowane klientki mają ustawioną datę w tej kolumnie.
+# Migracja (SQL Editor w Supabase):
+#   alter table klientki add column if not exists zarchiwizowano timestamptz;
+#   create index if not exists klientki_aktywne_idx on klientki (salon_id, id) where zarchiwizowano is null;
+ARCHIVE_COLUMN = "zarchiwizowano"
+# Kod Postgresa "kolumna nie istnieje" (PostgREST oddaje go w APIError.code)
+MISSING_COLUMN_CODE = "42703"
+_has_archive_column = None  # None - jeszcze nie sprawdzone
+
+def has_archive_column():
+    """
+    Czy baza ma już kolumnę archiwum (sprawdzane raz na proces).
+    Przed migracją filtr by wywalał każde zapytanie, a UI pokazywałoby pustą bazę.
+    """
+    global _has_archive_column
+    if _has_archive_column is None:
+        try:
+            run_query(get_client().table("klientki").select(ARCHIVE_COLUMN).limit(1), "archive_column_check")
+            _has_archive_column = True
+        except Exception as e:
+            if getattr(e, "code", None) != MISSING_COLUMN_CODE:
+                # Błąd chwilowy - nie zapamiętujemy, sprawdzimy przy następnym zapytaniu
+                return True
+            logger.warning("Brak kolumny %s w tabeli klientki - archiwum wyłączone, uruchom migrację", ARCHIVE_COLUMN)
+            _has_archive_column = False
+    return _has_archive_column
+
+def active_only(query):
+    """Filtr zapytania: tylko niezarchiwizowane klientki (bez kolumny archiwum - wszystkie)."""
+    return query.is_(ARCHIVE_COLUMN, "null") if has_archive_column() else query
+
+def _client_row(salon_id, imie, telefon, zabieg, data, kierunkowy="48"):
+    """Buduje słownik wiersza 'klientki' gotowy do wysłania do bazy (telefon już znormalizowany)"""
     # Fix na daty (puste stringi na None)
     data_val = str(data) if data and str(data).strip() != "" else None
     
+    return {
+        "salon_id": salon_id, 
+        "imie": str(imie), 
+        "telefon": telefon,
+        "kierunkowy": kierunkowy, 
+        "ostatni_zabieg": str(zabieg), 
+        "data_wizyty": data_val
+    }
+
+def add_client(salon_id, imie, telefon, zabieg, data, kierunkowy="48"):
+    # Czyścimy numer przed wysłaniem (np. "+48 500-600-700" -> 48 / 500600700)
+    kier, tel, valid = phones.normalize_phone(telefon, kierunkowy)
+    if not valid: return False, f"Nieprawidłowy numer telefonu: {telefon}"
     try:
-        supabase.table("klientki").insert({
-            "salon_id": salon_id, 
-            "imie": str(imie), 
-            "telefon": clean_tel,
-            "kierunkowy": clean_kier, 
-            "ostatni_zabieg": str(zabieg), 
-            "data_wizyty": data_val
-        }).execute()
+        run_query(get_client().table("klientki").insert(_client_row(salon_id, imie, tel, zabieg, data, kier)), "add_client")
+        invalidate_clients_cache(salon_id)
         return True, ""
     except Exception as e:
         return False, str(e)
 
-def get_clients(salon_id):
+# Komunikaty w wynikach add_clients_bulk (żeby UI mogło je policzyć)
+MSG_UPDATED = "Zaktualizowano"
+MSG_DUPLICATE_DB = "Duplikat - numer już jest w bazie"
+MSG_DUPLICATE_FILE = "Duplikat w pliku"
+
+def _write_chunk(rows, upsert=False):
+    """Wstawia (albo upsertuje) paczkę wierszy jednym requestem. Przy błędzie próbuje wiersz
+    po wierszu, żeby jeden zły kontakt nie blokował całej paczki."""
+    ok_msg = MSG_UPDATED if upsert else ""
+
+    def _send(payload):
+        table = get_client().table("klientki")
+        if not upsert:
+            run_query(table.insert(payload), "insert_clients")
+            return
+        # postgrest wysyła kolumny z sumy kluczy wszystkich wierszy, a brakujące wypełnia NULL-em -
+        # wiersz bez np. ostatni_zabieg straciłby zapisaną wartość. Dlatego osobny request na każdy zestaw kluczy.
+        groups = {}
+        for row in payload if isinstance(payload, list) else [payload]:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+        for group in groups.values():
+            run_query(get_client().table("klientki").upsert(group), "upsert_clients")
+
     try:
-        # Mimo włączonego RLS w bazie, filtrujemy też tutaj dla porządku
-        res = supabase.table("klientki").select("*").eq("salon_id", salon_id).execute()
-        return pd.DataFrame(res.data)
+        _send(rows)
+        return [(True, ok_msg)] * len(rows)
+    except Exception:
+        wyniki = []
+        for row in rows:
+            try:
+                _send(row)
+                wyniki.append((True, ok_msg))
+            except Exception as e:
+                wyniki.append((False, str(e)))
+        return wyniki
+
+def add_clients_bulk(salon_id, df, chunk_size=500, max_workers=1, on_progress=None, on_duplicate="skip"):
+    """
+    Masowe dodawanie klientek z DataFrame (kolumny: imie, telefon, ostatni_zabieg,
+    opcjonalnie kierunkowy i data_wizyty). Wstawia paczkami po `chunk_size` wierszy,
+    opcjonalnie równolegle (`max_workers` > 1).
+    Numery, które już są w bazie salonu: on_duplicate="skip" (pomiń), "update" (upsert
+    istniejącego wiersza) albo "insert" (dodaj mimo to).
+    Zwraca listę (sukces, komunikat) - po jednej pozycji na każdy wiersz, w kolejności df.
+    `on_progress(gotowe, wszystkie)` jest wołane po każdej paczce.
+    """
+    if df is None or df.empty: return []
+
+    # Numery normalizujemy całą kolumną naraz; błędne od razu oznaczamy jako niedodane
+    norm = phones.normalize_phones(df["telefon"], df["kierunkowy"] if "kierunkowy" in df.columns else None)
+    check_duplicates = on_duplicate != "insert"
+    try:
+        index = get_phone_index(salon_id) if check_duplicates else {}
+    except Exception as e:
+        # Bez pełnego indeksu duplikaty poszłyby jako nowe wiersze - lepiej nie zapisywać nic
+        return [(False, f"Nie udało się sprawdzić duplikatów: {e}")] * len(df)
+    dup_in_file = (norm["e164"].duplicated() & norm["valid"]).tolist()
+
+    wyniki = [None] * len(df)
+    to_insert, to_update = [], []  # (pozycja w df, wiersz)
+    for pos, (r, raw, tel, kier, e164, ok, dup) in enumerate(zip(
+            df.to_dict("records"), df["telefon"], norm["telefon"], norm["kierunkowy"],
+            norm["e164"], norm["valid"], dup_in_file)):
+        if not ok:
+            wyniki[pos] = (False, f"Nieprawidłowy numer telefonu: {raw}")
+            continue
+        if check_duplicates and dup:
+            wyniki[pos] = (False, MSG_DUPLICATE_FILE)
+            continue
+
+        row = _client_row(salon_id, r.get("imie", ""), tel, r.get("ostatni_zabieg", "Brak"), r.get("data_wizyty"), kier)
+        existing_id = index.get(e164)
+        if existing_id is None:
+            to_insert.append((pos, row))
+        elif on_duplicate == "update":
+            # Nie nadpisujemy znanych danych pustymi ("Brak" / brak daty wizyty)
+            row = {k: v for k, v in row.items() if v is not None and not (k == "ostatni_zabieg" and v == "Brak")}
+            row["id"] = existing_id
+            to_update.append((pos, row))
+        else:
+            wyniki[pos] = (False, MSG_DUPLICATE_DB)
+
+    jobs = [
+        (items[i:i + chunk_size], upsert)
+        for items, upsert in ((to_insert, False), (to_update, True))
+        for i in range(0, len(items), chunk_size)
+    ]
+    total = len(to_insert) + len(to_update)
+    gotowe = 0
+
+    def _run(job):
+        items, upsert = job
+        return _write_chunk([row for _, row in items], upsert)
+
+    def _done(job, job_wyniki):
+        nonlocal gotowe
+        for (pos, _), w in zip(job[0], job_wyniki): wyniki[pos] = w
+        gotowe += len(job[0])
+        if on_progress: on_progress(gotowe, total)
+
+    if max_workers > 1 and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(bind(_run), job): job for job in jobs}
+            for fut in as_completed(futures):
+                _done(futures[fut], fut.result())
+    else:
+        for job in jobs:
+            _done(job, _run(job))
+
+    if jobs: invalidate_clients_cache(salon_id)
+    return wyniki
+
+def count_bulk_results(wyniki):
+    """Liczniki do komunikatu po imporcie: dodane, zaktualizowane, duplikaty, błędy."""
+    counts = {"added": 0, "updated": 0, "duplicates": 0, "failed": 0}
+    for ok, msg in wyniki:
+        if ok: counts["updated" if msg == MSG_UPDATED else "added"] += 1
+        elif msg in (MSG_DUPLICATE_DB, MSG_DUPLICATE_FILE): counts["duplicates"] += 1
+        else: counts["failed"] += 1
+    return counts
+
+def _watermark(df, previous=None):
+    """Najnowszy znacznik zmiany w danych (pd.Timestamp UTC) albo `previous`, gdy nie ma czego liczyć."""
+    if df.empty or UPDATED_COLUMN not in df.columns: return previous
+    latest = pd.to_datetime(df[UPDATED_COLUMN], utc=True, format="ISO8601").max()
+    if pd.isna(latest): return previous
+    return latest if previous is None else max(latest, previous)
+
+def merge_client_delta(df, delta):
+    """
+    Nakłada zmienione wiersze na snapshot (po 'id'): zmienione podmienia w miejscu,
+    nowe dokleja na końcu, zarchiwizowane usuwa. Kolejność pozostałych się nie zmienia.
+    """
+    if delta.empty: return df
+    delta = delta.set_index("id")
+    archived = delta[ARCHIVE_COLUMN].notna() if ARCHIVE_COLUMN in delta.columns else pd.Series(False, index=delta.index)
+    active = delta[~archived]
+    if df.empty: return active.reset_index()
+
+    base = df.set_index("id")
+    order = base.index.drop(delta.index[archived], errors="ignore")
+    order = order.append(active.index.difference(order))
+    merged = pd.concat([base.drop(index=delta.index, errors="ignore"), active])
+    return merged.loc[order].reset_index()
+
+def _fetch_all_clients(salon_id):
+    # Mimo włączonego RLS w bazie, filtrujemy też tutaj dla porządku.
+    # Stronami - inaczej snapshot dużego salonu byłby ucięty na 1000 i sprawdzenie liczności w delcie zawsze by padało.
+    return pd.DataFrame(fetch_clients_paged(salon_id, ("*",), "get_clients"))
+
+def _sync_clients_delta(salon_id, snapshot):
+    """Snapshot uzupełniony o zmiany od ostatniej synchronizacji albo None, gdy trzeba pobrać całość."""
+    since = snapshot.watermark - pd.Timedelta(seconds=CLIENTS_SYNC_OVERLAP)
+    # Bez active_only - zarchiwizowane też są potrzebne, żeby zniknęły ze snapshotu
+    res = run_query(
+        get_client().table("klientki").select("*").eq("salon_id", salon_id)
+        .gte(UPDATED_COLUMN, since.isoformat()).limit(CLIENTS_DELTA_MAX_ROWS),
+        "get_clients_delta",
+    )
+    if len(res.data) >= CLIENTS_DELTA_MAX_ROWS: return None
+    delta = pd.DataFrame(res.data)
+    df = merge_client_delta(snapshot.df, delta)
+    # Twardego usunięcia (np. z innego urządzenia) zmiany nie pokażą - wyłapujemy je po liczbie wierszy
+    if len(df) != count_clients(salon_id): return None
+    return df, _watermark(delta, snapshot.watermark)
+
+def get_clients(salon_id, use_cache=True):
+    now = time.time()
+    snapshot = None
+    if use_cache:
+        with _clients_cache_lock:
+            snapshot = _clients_cache.get(salon_id)
+            fresh_for = CLIENTS_SYNC_INTERVAL if snapshot and snapshot.watermark is not None else CLIENTS_CACHE_TTL
+            if snapshot and not snapshot.stale and now - snapshot.synced_at < fresh_for:
+                _clients_cache_stats["hits"] += 1
+                # Kopia, bo app.py dokłada kolumny (np. "Usuń") do wyniku
+                return snapshot.df.copy()
+
+    if snapshot and snapshot.watermark is not None and now - snapshot.full_at < CLIENTS_FULL_SYNC_SECONDS:
+        try:
+            synced = _sync_clients_delta(salon_id, snapshot)
+        except Exception as e:
+            logger.warning("Synchronizacja przyrostowa klientek nieudana, pobieram całość: %s", e)
+            synced = None
+        if synced is not None:
+            df, watermark = synced
+            with _clients_cache_lock:
+                _clients_cache_stats["delta_syncs"] += 1
+                _clients_cache[salon_id] = _Snapshot(df, watermark, snapshot.full_at)
+            return df.copy()
+
+    if use_cache:
+        with _clients_cache_lock:
+            _clients_cache_stats["misses"] += 1
+    try:
+        df = _fetch_all_clients(salon_id)
     except:
         return pd.DataFrame()
+    with _clients_cache_lock:
+        _clients_cache[salon_id] = _Snapshot(df, _watermark(df), now)
+    return df.copy()
+
+# Kolumny potrzebne w zakładce "Baza Klientek" - reszty nie ściągamy
+CLIENT_LIST_COLUMNS = ("id", "imie", "kierunkowy", "telefon", "ostatni_zabieg")
+
+def get_clients_page(salon_id, after_id=None, page_size=50, columns=CLIENT_LIST_COLUMNS):
+    """
+    Jedna strona klientek salonu, posortowana po id (paginacja keyset: "id > after_id").
+    Koszt zapytania nie zależy od tego, czy salon ma 200 czy 200 000 klientek.
+    """
+    try:
+        query = active_only(get_client().table("klientki").select(*columns).eq("salon_id", salon_id))
+        if after_id is not None: query = query.gt("id", after_id)
+        res = run_query(query.order("id").limit(page_size), "get_clients_page")
+        return pd.DataFrame(res.data, columns=list(columns))
+    except Exception:
+        return pd.DataFrame()
+
+def count_clients(salon_id):
+    """Liczba klientek salonu (COUNT po stronie bazy, bez pobierania wierszy)"""
+    try:
+        res = run_query(active_only(get_client().table("klientki").select("id", count="exact", head=True).eq("salon_id", salon_id)), "count_clients")
+        return res.count or 0
+    except Exception:
+        return 0
+
+# PostgREST w Supabase domyślnie nie odda więcej wierszy w jednej odpowiedzi
+FETCH_PAGE_SIZE = 1000
+
+def fetch_clients_paged(salon_id, columns=("*",), name="fetch_clients", page_size=FETCH_PAGE_SIZE):
+    """
+    Wszystkie aktywne klientki salonu (lista słowników), stronami po id - jak segments.fetch_segment.
+    Jedno select() bez stronicowania ucięłoby salon powyżej 1000 klientek. Błąd leci wyżej.
+    """
+    rows, after_id = [], None
+    while True:
+        query = active_only(get_client().table("klientki").select(*columns).eq("salon_id", salon_id))
+        if after_id is not None: query = query.gt("id", after_id)
+        data = run_query(query.order("id").limit(page_size), name).data
+        rows.extend(data)
+        if len(data) < page_size: return rows
+        after_id = data[-1]["id"]
+
+def get_phone_index(salon_id):
+    """
+    Indeks numerów salonu: pełny numer (kierunkowy + telefon) -> id klientki.
+    Pobiera tylko id/kierunkowy/telefon, stronami - kompletny także dla dużych salonów.
+    """
+    df = pd.DataFrame(fetch_clients_paged(salon_id, ("id", "kierunkowy", "telefon"), "get_phone_index"),
+                      columns=["id", "kierunkowy", "telefon"])
+    if df.empty: return {}
+    return dict(zip(phones.full_numbers(df), df["id"].tolist()))
 
 def update_clients_bulk(data_list):
     """Masowa aktualizacja lub dodawanie (Upsert)"""
     try:
         if not data_list: return True, "Brak danych."
-        supabase.table("klientki").upsert(data_list).execute()
+        run_query(get_client().table("klientki").upsert(data_list), "update_clients_bulk")
+        for salon_id in {row.get("salon_id") for row in data_list}:
+            invalidate_clients_cache(salon_id)
         return True, "Zapisano pomyślnie!"
     except Exception as e:
         return False, str(e)
 
-def delete_clients_by_ids(id_list, salon_id):
-    """Usuwa listę klientek (bezpiecznie sprawdzając salon_id)"""
-    try:
-        if not id_list: return True
+# --- USUWANIE ---
+# Id idą w URL-u (?id=in.(...)), więc dzielimy je na paczki - tysiące id w jednym
+# zapytaniu przekraczają limit długości adresu po stronie serwera.
+DELETE_CHUNK_SIZE = 200
+DELETE_MAX_WORKERS = 4
+DELETE_RETRIES = 3
+
+def _delete_chunk(ids, salon_id, archive=False):
+    """
+    Usuwa (albo archiwizuje) jedną paczkę. Zwraca (ile_usunieto, błąd albo None).
+    Błędy chwilowe są ponawiane (resilience.call_with_retry), trwałe - od razu zwracane.
+    """
+    def _run():
+        table = get_client().table("klientki")
+        if archive:
+            query = table.update({ARCHIVE_COLUMN: pd.Timestamp.now(tz="UTC").isoformat()}).is_(ARCHIVE_COLUMN, "null")
+        else:
+            query = table.delete()
         # Usuwamy tylko jeśli ID jest na liście I należy do tego salonu
-        supabase.table("klientki").delete().in_("id", id_list).eq("salon_id", salon_id).execute()
-        return True
+        return run_query(query.in_("id", ids).eq("salon_id", salon_id), "archive_clients" if archive else "delete_clients")
+
+    try:
+        res = resilience.call_with_retry(_run, retries=DELETE_RETRIES)
+        return len(res.data or []), None
     except Exception as e:
-        print(f"Błąd usuwania: {e}")
-        return False
+        return 0, str(e)
+
+def delete_clients_by_ids(id_list, salon_id, archive=False, chunk_size=DELETE_CHUNK_SIZE,
+                          max_workers=DELETE_MAX_WORKERS, on_progress=None):
+    """
+    Usuwa listę klientek (bezpiecznie sprawdzając salon_id) paczkami, równolegle, z ponawianiem.
+    archive=True - zamiast kasować ustawia znacznik archiwizacji (szybkie, odwracalne),
+    a same wiersze można później wyczyścić przez purge_archived_clients.
+    Zwraca liczniki: {"deleted", "failed", "not_found", "errors"}.
+    """
+    ids = list(dict.fromkeys(id_list or []))
+    counts = {"deleted": 0, "failed": 0, "not_found": 0, "errors": []}
+    if not ids: return counts
+
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    gotowe = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as pool:
+        futures = {pool.submit(bind(_delete_chunk), chunk, salon_id, archive): chunk for chunk in chunks}
+        for fut in as_completed(futures):
+            chunk = futures[fut]
+            deleted, error = fut.result()
+            if error:
+                counts["failed"] += len(chunk)
+                counts["errors"].append(error)
+            else:
+                counts["deleted"] += deleted
+                # Id spoza salonu albo już usunięte - baza nic nie zwróciła
+                counts["not_found"] += len(chunk) - deleted
+            gotowe += len(chunk)
+            if on_progress: on_progress(gotowe, len(ids))
+
+    invalidate_clients_cache(salon_id)
+    return counts
+
+def purge_archived_clients(salon_id, older_than_days=30):
+    """Trwale usuwa klientki zarchiwizowane dawniej niż `older_than_days` dni temu."""
+    granica = (pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=older_than_days)).isoformat()
+    try:
+        res = run_query(get_client().table("klientki").delete().eq("salon_id", salon_id).lt(ARCHIVE_COLUMN, granica), "purge_archived")
+        return True, len(res.data or [])
+    except Exception as e:
+        return False, str(e)
+
+def format_delete_result(counts, archive=False):
+    """Komunikat dla UI, np. 'Usunięto 120 osób (błąd przy 3).'"""
+    msg = f"{'Zarchiwizowano' if archive else 'Usunięto'} {counts['deleted']} osób"
+    if counts["failed"]: msg += f" (błąd przy {counts['failed']})"
+    return msg + "."
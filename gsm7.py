@@ -0,0 +1,94 @@
+import math
+import re
+import unicodedata
+
+# --- ALFABET GSM-7 (GSM 03.38) ---
+# SMS zapisany w całości tymi znakami to 160 znaków na część (153 przy SMS-ie wieloczęściowym).
+# Jeden znak spoza alfabetu (np. "ą" albo emoji) przełącza cały SMS na UCS-2: 70 / 67 znaków.
+GSM7_BASIC = (
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Znaki z tablicy rozszerzonej - każdy zajmuje 2 miejsca (ESC + znak)
+GSM7_EXTENDED = "^{}\\[~]|€\f"
+
+GSM7_SINGLE_LIMIT, GSM7_MULTI_LIMIT = 160, 153
+UCS2_SINGLE_LIMIT, UCS2_MULTI_LIMIT = 70, 67
+
+_GSM7_CHARS = set(GSM7_BASIC) | set(GSM7_EXTENDED)
+
+# Zamiany, których nie da się uzyskać z rozkładu Unicode (NFKD)
+_ZAMIANY = {
+    'ł': 'l', 'Ł': 'L', 'đ': 'd', 'Đ': 'D', 'ø': 'o',
+    '‘': "'", '’': "'", '‚': "'", '“': '"', '”': '"', '„': '"', '«': '"', '»': '"',
+    '–': '-', '—': '-', '−': '-', '…': '...', ' ': ' ', '\t': ' ',
+}
+
+# Polskie SMS-y piszemy bez ogonków, więc również litery akcentowane z alfabetu GSM
+# (é, ö, ...) sprowadzamy do podstawowych - tak jak dotąd robiło usun_ogonki.
+_AKCENTOWANE_GSM = set("ÄÖÑÜäöñüàèéùìòÇÅåÉ")
+
+class _Gsm7Table(dict):
+    """
+    Tablica dla str.translate uzupełniana leniwie: znak z alfabetu GSM zostaje,
+    znany znak jest zamieniany, litera z ogonkiem traci ogonek (NFKD), reszta (emoji) znika.
+    Dzięki temu cała wiadomość to jedno przejście translate zamiast serii replace().
+    """
+
+    def __missing__(self, codepoint):
+        ch = chr(codepoint)
+        if ch in _ZAMIANY:
+            value = _ZAMIANY[ch]
+        elif ch in _GSM7_CHARS and ch not in _AKCENTOWANE_GSM:
+            value = ch
+        else:
+            base = "".join(c for c in unicodedata.normalize("NFKD", ch) if not unicodedata.combining(c))
+            value = base if base and all(c in _GSM7_CHARS for c in base) else ""
+        self[codepoint] = value
+        return value
+
+_TABLE = _Gsm7Table()
+
+_EXT_RE = re.compile("[" + re.escape(GSM7_EXTENDED) + "]")
+_NON_GSM_RE = re.compile("[^" + re.escape("".join(sorted(_GSM7_CHARS))) + "]")
+
+def to_gsm7(text):
+    """Zamienia tekst na znaki GSM-7 jednym przejściem (bez ogonków, bez emoji)."""
+    if not isinstance(text, str): return ""
+    return text.translate(_TABLE)
+
+def unsupported_chars(text):
+    """Znaki, których nie da się zamienić na GSM-7 i które to_gsm7 po prostu usunie (np. emoji)."""
+    if not isinstance(text, str): return set()
+    return {ch for ch in set(text) if ch not in _GSM7_CHARS and _TABLE[ord(ch)] == ""}
+
+def is_gsm7(text):
+    return isinstance(text, str) and _NON_GSM_RE.search(text) is None
+
+def count_segments(text):
+    """Liczba części (SMS-ów), za które zapłacimy."""
+    if not text: return 0
+    if is_gsm7(text):
+        length = len(text) + len(_EXT_RE.findall(text))
+        single, multi = GSM7_SINGLE_LIMIT, GSM7_MULTI_LIMIT
+    else:
+        length = len(text.encode("utf-16-le")) // 2
+        single, multi = UCS2_SINGLE_LIMIT, UCS2_MULTI_LIMIT
+    return 1 if length <= single else math.ceil(length / multi)
+
+# --- WERSJE WEKTOROWE (pandas) ---
+
+def normalize_series(series):
+    """to_gsm7 na całej kolumnie DataFrame."""
+    return series.fillna("").astype(str).str.translate(_TABLE)
+
+def count_segments_series(series):
+    """count_segments na całej kolumnie - bez pętli Pythona po wierszach."""
+    series = series.fillna("").astype(str)
+    gsm = ~series.str.contains(_NON_GSM_RE)
+    length = series.str.len() + series.str.count(_EXT_RE).where(gsm, 0)
+
+    single = gsm.map({True: GSM7_SINGLE_LIMIT, False: UCS2_SINGLE_LIMIT})
+    multi = gsm.map({True: GSM7_MULTI_LIMIT, False: UCS2_MULTI_LIMIT})
+    segments = (length.where(length > single, 0) + multi - 1) // multi
+    return segments.where(length > single, (length > 0).astype(int)).astype(int)
@@ -0,0 +1,144 @@
+import pandas as pd
+
+import database as db
+import phones
+import services as srv
+
+# --- IMPORT KONTAKTÓW Z PLIKU ---
+# Duże eksporty (dziesiątki tysięcy wierszy) czytamy paczkami i tylko potrzebne kolumny:
+# CSV przez pd.read_csv(usecols=..., chunksize=...), XLSX przez openpyxl w trybie read_only.
+
+IMPORT_CHUNK_SIZE = 5000   # wierszy w jednej paczce (odczyt + zapis do bazy)
+PREVIEW_ROWS = 20          # ile wierszy pokazujemy w podglądzie dużego pliku
+EDITOR_ROW_LIMIT = 1000    # do tylu wierszy dajemy pełną edycję z checkboxami
+
+def _kind(uploaded_file):
+    name = uploaded_file.name.lower()
+    if name.endswith(".vcf"): return "vcf"
+    if name.endswith(".csv"): return "csv"
+    return "xlsx"
+
+def detect_columns(columns):
+    """
+    Szuka kolumn z imieniem, telefonem i zabiegiem (po fragmencie nazwy, bez wielkości liter).
+    Zwraca słownik z oryginalnymi nazwami kolumn; None tam, gdzie nic nie pasuje.
+    """
+    def _find(*fragments):
+        return next((c for c in columns if any(f in str(c).lower() for f in fragments)), None)
+
+    return {
+        "imie": _find("imi", "name"),
+        "telefon": _find("tel", "num"),
+        "ostatni_zabieg": _find("zabieg", "usluga", "service"),
+    }
+
+def _xlsx_rows(uploaded_file):
+    """Wiersze arkusza (krotki wartości) - openpyxl read_only, bez wczytywania całego pliku."""
+    from openpyxl import load_workbook  # tylko dla XLSX - nie spowalnia startu aplikacji
+    uploaded_file.seek(0)
+    wb = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        yield from wb.active.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+def read_columns(uploaded_file):
+    """Nagłówek pliku (lista nazw kolumn)."""
+    kind = _kind(uploaded_file)
+    if kind == "vcf":
+        return ["Imię", "Telefon", "Ostatni Zabieg"]  # kolumny z srv.parse_vcf
+    if kind == "csv":
+        uploaded_file.seek(0)
+        return list(pd.read_csv(uploaded_file, nrows=0).columns)
+    header = next(_xlsx_rows(uploaded_file), ())
+    return [c for c in header if c is not None]
+
+def _cell_to_str(value):
+    # Excel trzyma numery telefonów jako liczby - 500600700.0 nie może stać się "5006007000"
+    if isinstance(value, float) and value.is_integer(): value = int(value)
+    return "" if value is None else str(value)
+
+def normalize_chunk(df, cols):
+    """
+    Paczka surowych wierszy -> kolumny bazy: imie, kierunkowy, telefon (numer krajowy), ostatni_zabieg
+    oraz telefon_ok (czy numer przeszedł walidację).
+    """
+    norm = phones.normalize_phones(df[cols["telefon"]])
+    out = pd.DataFrame({
+        "imie": df[cols["imie"]].fillna("").astype(str).str.strip(),
+        "kierunkowy": norm["kierunkowy"],
+        "telefon": norm["telefon"],
+        "telefon_ok": norm["valid"],
+    })
+    if cols["ostatni_zabieg"]:
+        zabieg = df[cols["ostatni_zabieg"]].fillna("").astype(str).str.strip()
+        out["ostatni_zabieg"] = zabieg.where(zabieg != "", "Brak")
+    else:
+        # Jeśli nie ma kolumny z zabiegiem - wpisujemy "Brak"
+        out["ostatni_zabieg"] = "Brak"
+    return out
+
+def iter_chunks(uploaded_file, cols, chunk_size=IMPORT_CHUNK_SIZE):
+    """Znormalizowane paczki (DataFrame) z pliku - tylko wykryte kolumny."""
+    kind = _kind(uploaded_file)
+    usecols = [c for c in cols.values() if c]
+
+    if kind == "vcf":
+        df = srv.parse_vcf(uploaded_file)
+        for start in range(0, len(df), chunk_size):
+            yield normalize_chunk(df.iloc[start:start + chunk_size], cols)
+
+    elif kind == "csv":
+        uploaded_file.seek(0)
+        for chunk in pd.read_csv(uploaded_file, usecols=usecols, dtype=str, chunksize=chunk_size):
+            yield normalize_chunk(chunk, cols)
+
+    else:
+        rows = _xlsx_rows(uploaded_file)
+        header = list(next(rows, ()))
+        idx = {c: header.index(c) for c in usecols}
+        buffer = []
+        for row in rows:
+            buffer.append([_cell_to_str(row[idx[c]]) if idx[c] < len(row) else "" for c in usecols])
+            if len(buffer) >= chunk_size:
+                yield normalize_chunk(pd.DataFrame(buffer, columns=usecols), cols)
+                buffer = []
+        if buffer:
+            yield normalize_chunk(pd.DataFrame(buffer, columns=usecols), cols)
+
+def summarize(uploaded_file, cols, chunk_size=IMPORT_CHUNK_SIZE):
+    """Jedno przejście po pliku: liczniki wierszy + próbka do podglądu."""
+    summary = {"rows": 0, "valid": 0, "invalid_phone": 0, "missing_name": 0, "sample": None}
+    for chunk in iter_chunks(uploaded_file, cols, chunk_size):
+        if summary["sample"] is None: summary["sample"] = chunk.head(PREVIEW_ROWS)
+        invalid_phone = ~chunk["telefon_ok"]
+        missing_name = chunk["imie"] == ""
+        summary["rows"] += len(chunk)
+        summary["invalid_phone"] += int(invalid_phone.sum())
+        summary["missing_name"] += int(missing_name.sum())
+        summary["valid"] += int((~invalid_phone & ~missing_name).sum())
+    if summary["sample"] is None:
+        summary["sample"] = pd.DataFrame(columns=["imie", "kierunkowy", "telefon", "ostatni_zabieg", "telefon_ok"])
+    return summary
+
+def import_file(salon_id, uploaded_file, cols, on_progress=None, on_duplicate="skip", chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Zapisuje cały plik do bazy paczkami przez db.add_clients_bulk (pomija wiersze bez imienia
+    lub z błędnym numerem). Zwraca liczniki z db.count_bulk_results.
+    `on_progress(przetworzone_wiersze)` po każdej paczce.
+    """
+    wyniki, processed = [], 0
+    for chunk in iter_chunks(uploaded_file, cols, chunk_size):
+        processed += len(chunk)
+        chunk = chunk[chunk["telefon_ok"] & (chunk["imie"] != "")]
+        if not chunk.empty:
+            wyniki += db.add_clients_bulk(salon_id, chunk.drop(columns="telefon_ok"), on_duplicate=on_duplicate)
+        if on_progress: on_progress(processed)
+    return db.count_bulk_results(wyniki)
+
+def format_result(counts):
+    """Komunikat po imporcie, np. 'Dodano 120 kontaktów, zaktualizowano 5, pominięto 14 duplikatów.'"""
+    msg = f"Dodano {counts['added']} kontaktów"
+    if counts["updated"]: msg += f", zaktualizowano {counts['updated']}"
+    if counts["duplicates"]: msg += f", pominięto {counts['duplicates']} duplikatów"
+    return msg + "!"
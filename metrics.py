@@ -0,0 +1,186 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import streamlit as st
+
+import resilience
+
+logger = logging.getLogger(__name__)
+
+# --- POMIARY WYWOŁAŃ ZEWNĘTRZNYCH (Supabase, Gemini, SMSAPI) ---
+# Każde wywołanie to "span": nazwa (np. "supabase.get_clients"), czas, rozmiar danych
+# (wiersze / znaki) i wynik ("ok" albo klasa błędu z resilience.classify_error).
+# Spany zbieramy w pamięci procesu - osobno dla każdej kampanii - a opcjonalnie dopisujemy
+# do pliku JSONL (secret METRICS_PATH). Zestawienie: percentyle p50/p95/p99 i tempo (wywołań/s).
+
+MAX_SAMPLES = 5000  # ile ostatnich czasów trzymamy na jedną serię (do percentyli)
+QUANTILES = (0.5, 0.95, 0.99)
+# Każda kampania to nowe serie - w długo działającym procesie trzymamy tylko ostatnie
+MAX_CAMPAIGNS = 50
+CAMPAIGN_TTL = 24 * 3600  # sekundy od ostatniego wywołania kampanii
+
+_campaign = contextvars.ContextVar("campaign", default="")
+
+class _Series:
+    """Jedna seria pomiarów: (kampania, nazwa wywołania)."""
+
+    def __init__(self):
+        self.durations = deque(maxlen=MAX_SAMPLES)
+        self.count = 0
+        self.outcomes = defaultdict(int)
+        self.size = 0
+        self.first = None
+        self.last = None
+
+class Metrics:
+    def __init__(self, jsonl_path=None):
+        self.series = defaultdict(_Series)
+        self.lock = threading.Lock()
+        self.jsonl_path = jsonl_path
+        self._file = None
+
+    def record(self, name, duration, outcome="ok", size=0, campaign=None):
+        campaign = _campaign.get() if campaign is None else campaign
+        now = time.time()
+        with self.lock:
+            is_new = (campaign, name) not in self.series
+            s = self.series[(campaign, name)]
+            s.durations.append(duration)
+            s.count += 1
+            s.outcomes[outcome] += 1
+            s.size += size
+            s.first = s.first or now - duration
+            s.last = now
+            if is_new and campaign: self._prune_campaigns(now)
+            if self.jsonl_path:
+                self._write_jsonl({"ts": round(now, 3), "name": name, "campaign": campaign,
+                                   "ms": round(duration * 1000, 2), "outcome": outcome, "size": size})
+
+    def _prune_campaigns(self, now):
+        """Usuwa serie kampanii bez wywołań od CAMPAIGN_TTL i najstarsze ponad MAX_CAMPAIGNS (pod lockiem)."""
+        last_seen = defaultdict(float)
+        for (camp, _), s in self.series.items():
+            if camp: last_seen[camp] = max(last_seen[camp], s.last or 0)
+        by_age = sorted(last_seen, key=last_seen.get, reverse=True)
+        drop = {c for c in by_age[MAX_CAMPAIGNS:]} | {c for c in by_age if now - last_seen[c] > CAMPAIGN_TTL}
+        for key in [k for k in self.series if k[0] in drop]:
+            del self.series[key]
+
+    def _write_jsonl(self, item):
+        try:
+            if self._file is None: self._file = open(self.jsonl_path, "a", encoding="utf-8", buffering=1)
+            self._file.write(json.dumps(item, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning("Metryki bez pliku: %s", e)
+            self.jsonl_path = None
+
+    @contextmanager
+    def span(self, name, size=0):
+        """
+        with metrics.span("smsapi.send", size=len(message)) as span:
+            ...  # span.size można też ustawić po fakcie (np. liczba zwróconych wierszy)
+        """
+        span = _Span(size)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            span.outcome = resilience.classify_error(e)
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, span.outcome, span.size)
+
+    def summary(self, campaign=None):
+        """Lista słowników (jeden na serię): liczby, błędy, p50/p95/p99 w ms, rozmiar, tempo."""
+        with self.lock:
+            items = [(key, s, sorted(s.durations), dict(s.outcomes)) for key, s in self.series.items()
+                     if campaign is None or key[0] == campaign]
+        rows = []
+        for (camp, name), s, durations, outcomes in sorted(items, key=lambda x: x[0]):
+            window = (s.last - s.first) if s.first and s.last else 0
+            row = {"kampania": camp, "wywołanie": name, "liczba": s.count,
+                   "błędy": s.count - outcomes.get("ok", 0)}
+            for q in QUANTILES:
+                row[f"p{int(q * 100)} ms"] = round(_quantile(durations, q) * 1000, 1)
+            row["śr. rozmiar"] = round(s.size / s.count, 1) if s.count else 0
+            row["na sekundę"] = round(s.count / window, 2) if window > 0 and s.count > 1 else None
+            rows.append(row)
+        return rows
+
+    def campaigns(self):
+        with self.lock:
+            return sorted({camp for camp, _ in self.series if camp})
+
+    def prometheus_text(self):
+        """Wszystkie serie w formacie tekstowym Prometheusa (summary + liczniki wyników)."""
+        with self.lock:
+            items = [(key, sorted(s.durations), s.count, sum(s.durations), dict(s.outcomes), s.size)
+                     for key, s in self.series.items()]
+        lines = [
+            "# TYPE beauty_call_seconds summary",
+            "# TYPE beauty_call_outcomes_total counter",
+            "# TYPE beauty_call_payload_total counter",
+        ]
+        for (camp, name), durations, count, total, outcomes, size in sorted(items, key=lambda x: x[0]):
+            labels = f'call="{_escape_label(name)}",campaign="{_escape_label(camp)}"'
+            for q in QUANTILES:
+                lines.append(f'beauty_call_seconds{{{labels},quantile="{q}"}} {_quantile(durations, q):.6f}')
+            # _sum liczymy z zachowanych próbek, _count - ze wszystkich wywołań
+            lines.append(f"beauty_call_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"beauty_call_seconds_count{{{labels}}} {count}")
+            for outcome, n in sorted(outcomes.items()):
+                lines.append(f'beauty_call_outcomes_total{{{labels},outcome="{outcome}"}} {n}')
+            lines.append(f"beauty_call_payload_total{{{labels}}} {size}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+class _Span:
+    def __init__(self, size=0):
+        self.size = size
+        self.outcome = "ok"
+
+def _escape_label(value):
+    """Wartość etykiety Prometheusa: \\, " i nowa linia muszą być poprzedzone backslashem."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _quantile(sorted_values, q):
+    if not sorted_values: return 0.0
+    pos = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[pos]
+
+@contextmanager
+def campaign_scope(campaign_id):
+    """Wszystkie spany w tym bloku (również w wątkach puszczonych przez bind) należą do kampanii."""
+    token = _campaign.set(str(campaign_id))
+    try:
+        yield
+    finally:
+        _campaign.reset(token)
+
+def bind(fn):
+    """Funkcja do ThreadPoolExecutor.submit, która zachowa bieżącą kampanię w wątku roboczym."""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.copy().run(fn, *args, **kwargs)
+
+def _init_metrics():
+    try:
+        path = st.secrets.get("METRICS_PATH")
+    except Exception:
+        path = None
+    return Metrics(jsonl_path=path)
+
+# Jeden rejestr na proces
+metrics = _init_metrics()
+span = metrics.span
@@ -0,0 +1,87 @@
+import pandas as pd
+
+# --- NUMERY TELEFONÓW (E.164) ---
+# Jedno miejsce, które zamienia dowolnie wpisany numer ("+48 500-600-700", "0048...",
+# "500600700", 500600700.0 z Excela) na parę kierunkowy + numer krajowy.
+# Wszystko na całych kolumnach pandas - bez pętli Pythona po wierszach.
+
+DEFAULT_COUNTRY = "48"
+
+# Kierunkowe, które rozpoznajemy w numerach zapisanych z "+" / "00" (dłuższe najpierw)
+COUNTRY_CODES = [
+    "380", "420", "421", "370", "371", "372", "353", "358", "375", "373",
+    "30", "31", "32", "33", "34", "36", "39", "40", "41", "43", "44", "45", "46", "47", "48", "49",
+    "1", "7",
+]
+# Znana długość numeru krajowego; dla pozostałych krajów sprawdzamy tylko zakres
+NATIONAL_LENGTH = {"48": 9}
+MIN_NATIONAL, MAX_E164 = 6, 15
+
+_CC_RE = r"^(" + "|".join(COUNTRY_CODES) + r")"
+
+def normalize_phones(series, country=None, default_country=DEFAULT_COUNTRY):
+    """
+    Kolumna surowych numerów -> DataFrame (ten sam indeks) z kolumnami:
+    kierunkowy, telefon (krajowy), e164 (kierunkowy + numer, bez '+', tak jak chce SMSAPI), valid.
+    `country` - opcjonalna kolumna z kierunkowym zapisanym osobno (np. 'kierunkowy' z bazy).
+    """
+    raw = series.fillna("").astype(str).str.strip()
+    # 500600700.0 z Excela/CSV - ucinamy część dziesiętną, zanim zostawimy same cyfry
+    raw = raw.str.replace(r"\.0+$", "", regex=True)
+    international = raw.str.startswith("+") | raw.str.startswith("00")
+    digits = raw.str.replace(r"\D", "", regex=True)
+    digits = digits.where(~raw.str.startswith("00"), digits.str[2:])
+
+    if country is None:
+        given = pd.Series(default_country, index=series.index)
+    else:
+        given = country.fillna("").astype(str).str.replace(r"\D", "", regex=True).reindex(series.index)
+        given = given.where(given != "", default_country)
+
+    # 1. Numer z "+"/"00" - kierunkowy z początku numeru
+    cc_intl = digits.str.extract(_CC_RE, expand=False)
+
+    # 2. Bez "+": jeśli zaczyna się od znanego kierunkowego i jest o tyle dłuższy - odcinamy go
+    given_len = given.str.len()
+    expected_national = given.map(NATIONAL_LENGTH)
+    starts_with_given = pd.Series(False, index=series.index)
+    for n in given_len.unique():  # kilka różnych długości kierunkowych, nie pętla po wierszach
+        mask = given_len == n
+        starts_with_given[mask] = digits[mask].str[:n] == given[mask]
+    strip_given = ~international & starts_with_given & (
+        (digits.str.len() == given_len + expected_national) |
+        (expected_national.isna() & (digits.str.len() > given_len + MIN_NATIONAL))
+    )
+
+    kierunkowy = given.where(~international, cc_intl.fillna(""))
+    cut = kierunkowy.str.len().where(international | strip_given, 0)
+    telefon = digits.copy()
+    for n in cut.unique():
+        mask = cut == n
+        telefon[mask] = digits[mask].str[int(n):]
+
+    national_len = telefon.str.len()
+    expected = kierunkowy.map(NATIONAL_LENGTH)
+    valid = (kierunkowy != "") & (national_len >= MIN_NATIONAL) & \
+        (kierunkowy.str.len() + national_len <= MAX_E164)
+    valid &= expected.isna() | (national_len == expected)
+
+    return pd.DataFrame({
+        "kierunkowy": kierunkowy,
+        "telefon": telefon,
+        "e164": kierunkowy + telefon,
+        "valid": valid.astype(bool),
+    }, index=series.index)
+
+def normalize_phone(value, country=None, default_country=DEFAULT_COUNTRY):
+    """Wersja dla jednego numeru: (kierunkowy, telefon, valid)."""
+    row = normalize_phones(
+        pd.Series([value], dtype=object),
+        None if country is None else pd.Series([country], dtype=object),
+        default_country,
+    ).iloc[0]
+    return row["kierunkowy"], row["telefon"], bool(row["valid"])
+
+def full_numbers(df):
+    """Pełne numery do wysyłki (kierunkowy + telefon) dla DataFrame klientek z bazy."""
+    return normalize_phones(df["telefon"], df["kierunkowy"] if "kierunkowy" in df.columns else None)["e164"]
@@ -0,0 +1,68 @@
+import time
+
+# --- RAPORTOWANIE POSTĘPU ---
+# Każde progress_bar.progress() / status_box.text() to osobna wiadomość do przeglądarki.
+# Przy tysiącach odbiorców samo odświeżanie paska zajmowało zauważalną część czasu,
+# więc aktualizacje zbieramy i wysyłamy najwyżej kilka razy na sekundę.
+
+PROGRESS_MAX_UPDATES_PER_SEC = 5
+
+def format_eta(seconds):
+    """Sekundy -> '45 s', '3 min 20 s', '1 h 05 min'."""
+    seconds = int(round(seconds))
+    if seconds < 60: return f"{seconds} s"
+    if seconds < 3600: return f"{seconds // 60} min {seconds % 60:02d} s"
+    return f"{seconds // 3600} h {seconds % 3600 // 60:02d} min"
+
+class ProgressReporter:
+    """
+    Pasek postępu z ograniczoną liczbą odświeżeń, tempem (szt./s) i szacowanym czasem do końca.
+    `update(gotowe)` można wołać po każdej osobie - do UI trafia najwyżej `max_per_sec` zmian
+    na sekundę (plus zawsze ostatnia). `status_box` (opcjonalnie) dostaje tekst `detail`.
+    """
+
+    def __init__(self, total, progress_bar=None, status_box=None, label="", max_per_sec=PROGRESS_MAX_UPDATES_PER_SEC):
+        self.total = total
+        self.progress_bar = progress_bar
+        self.status_box = status_box
+        self.label = label
+        self.min_interval = 1.0 / max_per_sec if max_per_sec else 0.0
+        self.start = time.monotonic()
+        self.last_render = None
+        self.done = 0
+        self.renders = 0
+        self.rendered_done = None
+
+    def rate(self):
+        elapsed = time.monotonic() - self.start
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def text(self):
+        msg = f"{self.label} {self.done}/{self.total}".strip()
+        rate = self.rate()
+        if rate > 0:
+            msg += f" · {rate:.1f}/s"
+            if self.done < self.total: msg += f" · zostało ok. {format_eta((self.total - self.done) / rate)}"
+        return msg
+
+    def update(self, done, detail=None):
+        """Zapisuje postęp; rysuje tylko, jeśli minął odstęp albo to koniec."""
+        self.done = done
+        now = time.monotonic()
+        finished = done >= self.total
+        if not finished and self.last_render is not None and now - self.last_render < self.min_interval:
+            return False
+        self.last_render = now
+        self.renders += 1
+        self.rendered_done = done
+        if self.progress_bar is not None:
+            self.progress_bar.progress(min(done / self.total, 1.0) if self.total else 1.0, text=self.text())
+        if self.status_box is not None and detail:
+            self.status_box.text(detail)
+        return True
+
+    def finish(self):
+        """Dorysowuje ostatni stan, jeśli ostatnia aktualizacja została pominięta."""
+        if self.rendered_done != self.done:
+            self.last_render = None
+            self.update(self.done)
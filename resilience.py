@@ -0,0 +1,157 @@
+import hashlib
+import random
+import re
+import threading
+import time
+
+# --- ODPORNOŚĆ NA BŁĘDY ZEWNĘTRZNYCH USŁUG (Gemini, SMSAPI) ---
+# Zamiast poddawać się po pierwszym wyjątku, każdy błąd zaliczamy do jednej z klas:
+#   THROTTLE  - provider prosi o zwolnienie (429, quota) -> zwalniamy i ponawiamy,
+#   TRANSIENT - chwilowa awaria (timeout, 5xx, zerwane połączenie) -> ponawiamy z backoffem,
+#   PERMANENT - błąd danych (zły numer, brak środków, zła autoryzacja) -> nie ma sensu ponawiać.
+
+THROTTLE, TRANSIENT, PERMANENT = "throttle", "transient", "permanent"
+
+DEFAULT_RETRIES = 5
+BACKOFF_BASE = 0.5   # sekundy
+BACKOFF_CAP = 30.0
+
+_THROTTLE_MARKERS = ("quota", "resource exhausted", "resourceexhausted", "too many requests", "rate limit")
+_TRANSIENT_MARKERS = (
+    "timeout", "timed out", "temporarily", "unavailable", "connection", "reset by peer",
+    "internal error", "deadline", "try again",
+)
+_TRANSIENT_TYPES = ("timeout", "connectionerror", "serviceunavailable", "internalservererror", "deadlineexceeded")
+
+# Kody błędów SMSAPI: 201 - błąd wewnętrzny systemu, 202/203 - za dużo zapytań naraz
+SMSAPI_TRANSIENT_CODES = {201}
+SMSAPI_THROTTLE_CODES = {202, 203}
+
+class ServiceError(RuntimeError):
+    """Błąd zwrócony przez API: komunikat + kod HTTP i (jeśli jest) kod błędu providera."""
+
+    def __init__(self, message, status_code=None, code=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+
+def _http_status(e):
+    """Kod HTTP z wyjątku: atrybut status_code/code (SDK Google) albo '429 ...' na początku komunikatu."""
+    for attr in ("status_code", "code"):
+        value = getattr(e, attr, None)
+        if isinstance(value, int) and 100 <= value < 600: return value
+    match = re.match(r"\s*(\d{3})\b", str(e))
+    return int(match.group(1)) if match else None
+
+def classify_error(e):
+    """THROTTLE / TRANSIENT / PERMANENT dla dowolnego wyjątku (SDK Gemini, requests, ServiceError)."""
+    status = _http_status(e)
+    if isinstance(e, ServiceError):
+        # Odpowiedź API - ufamy kodom, a nie treści (w komunikacie bywa np. numer telefonu)
+        if status == 429 or e.code in SMSAPI_THROTTLE_CODES: return THROTTLE
+        if (status is not None and status >= 500) or e.code in SMSAPI_TRANSIENT_CODES: return TRANSIENT
+        return PERMANENT
+
+    if status == 429: return THROTTLE
+    if status is not None and status >= 500: return TRANSIENT
+    name = type(e).__name__.lower()
+    text = f"{name} {e}".lower()
+    if any(m in text for m in _THROTTLE_MARKERS): return THROTTLE
+    if any(t in name for t in _TRANSIENT_TYPES) or any(m in text for m in _TRANSIENT_MARKERS): return TRANSIENT
+    return PERMANENT
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Wykładniczy backoff z pełnym jitterem: losowo z [0, min(cap, base * 2^attempt)]."""
+    base, cap = base or BACKOFF_BASE, cap or BACKOFF_CAP
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def call_with_retry(fn, *args, retries=DEFAULT_RETRIES, limiter=None, sleep=time.sleep, **kwargs):
+    """
+    Woła fn(*args, **kwargs), ponawiając błędy THROTTLE i TRANSIENT (do `retries` prób).
+    `limiter` (opcjonalnie) dostaje on_throttle()/on_success() - np. AdaptiveRateLimiter
+    albo AdaptiveConcurrency - żeby całe zadanie zwolniło, gdy provider nie nadąża.
+    Błąd PERMANENT albo wyczerpanie prób - wyjątek leci dalej.
+    """
+    for attempt in range(retries):
+        if limiter is not None and hasattr(limiter, "acquire"): limiter.acquire()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            kind = classify_error(e)
+            if kind == PERMANENT or attempt == retries - 1: raise
+            if kind == THROTTLE and limiter is not None: limiter.on_throttle()
+            sleep(backoff_delay(attempt))
+            continue
+        if limiter is not None: limiter.on_success()
+        return result
+
+class AdaptiveConcurrency:
+    """
+    Limit równoległych wywołań, który sam się dostosowuje (AIMD): po sygnale THROTTLE
+    spada o połowę, a po serii udanych wywołań rośnie o 1 - aż do `max_limit`.
+    Użycie: `with concurrency: ...` wokół wywołania.
+    """
+
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = max_limit
+        self.active = 0
+        self.successes = 0
+        self.cond = threading.Condition()
+
+    def __enter__(self):
+        with self.cond:
+            while self.active >= self.limit:
+                self.cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    def on_throttle(self):
+        with self.cond:
+            self.limit = max(self.min_limit, self.limit // 2)
+            self.successes = 0
+
+    def on_success(self):
+        with self.cond:
+            self.successes += 1
+            if self.successes >= self.limit and self.limit < self.max_limit:
+                self.limit += 1
+                self.successes = 0
+                self.cond.notify_all()
+
+class Signals:
+    """
+    Przekazuje acquire/on_throttle/on_success do kilku limiterów naraz (np. tempo + współbieżność).
+    Każdy dostaje tylko te sygnały, które obsługuje (zwykły TokenBucket - samo acquire).
+    """
+
+    def __init__(self, *targets):
+        self.targets = [t for t in targets if t is not None]
+
+    def acquire(self):
+        for t in self.targets:
+            if hasattr(t, "acquire"): t.acquire()
+
+    def on_throttle(self):
+        for t in self.targets:
+            if hasattr(t, "on_throttle"): t.on_throttle()
+
+    def on_success(self):
+        for t in self.targets:
+            if hasattr(t, "on_success"): t.on_success()
+
+# --- KLUCZE IDEMPOTENCJI ---
+
+def idempotency_key(campaign_id, recipient):
+    """
+    Stały klucz dla pary (kampania, odbiorca). Trafia do SMSAPI jako `idx` z `check_idx=1`,
+    więc ponowienie (retry, wznowienie kampanii) tego samego SMS-a zostanie odrzucone
+    zamiast wysłane drugi raz. Tylko [0-9a-f], 32 znaki.
+    """
+    return hashlib.sha1(f"{campaign_id}\x1f{recipient}".encode("utf-8")).hexdigest()[:32]
@@ -0,0 +1,106 @@
+import datetime
+
+import pandas as pd
+
+import database as db
+
+# --- SEGMENTY ODBIORCÓW ---
+# Filtry kampanii zamieniamy na zapytanie do Supabase, więc to baza wybiera odbiorców,
+# a do aplikacji trafiają tylko pasujące wiersze (albo sama liczba).
+#
+# Filtry to zwykły słownik (łatwo go zapisać jako JSON):
+#   {"zabieg": "hybryd",        - fragment ostatniego zabiegu (bez wielkości liter)
+#    "nie_bylo_dni": 60,        - ostatnia wizyta dawniej niż 60 dni temu
+#    "bez_daty": True,          - ...albo data wizyty nieznana
+#    "kierunkowe": ["48"]}      - tylko te kierunkowe
+#
+# Zapisane segmenty trzymamy w tabeli "segmenty" (salon_id, nazwa, filtry jsonb).
+
+SEGMENT_PAGE_SIZE = 1000  # Supabase domyślnie i tak nie odda więcej wierszy naraz
+SEGMENT_COLUMNS = ("id", "imie", "kierunkowy", "telefon", "ostatni_zabieg", "data_wizyty")
+
+def _apply_filters(query, filters, today=None):
+    zabieg = (filters.get("zabieg") or "").strip()
+    if zabieg:
+        # % i _ to znaki specjalne LIKE - w nazwie zabiegu traktujemy je dosłownie
+        zabieg = zabieg.replace("%", r"\%").replace("_", r"\_")
+        query = query.ilike("ostatni_zabieg", f"%{zabieg}%")
+
+    dni = filters.get("nie_bylo_dni")
+    if dni:
+        granica = ((today or datetime.date.today()) - datetime.timedelta(days=int(dni))).isoformat()
+        if filters.get("bez_daty"):
+            query = query.or_(f"data_wizyty.lt.{granica},data_wizyty.is.null")
+        else:
+            query = query.lt("data_wizyty", granica)
+
+    kierunkowe = [k for k in filters.get("kierunkowe") or [] if k]
+    if kierunkowe:
+        query = query.in_("kierunkowy", kierunkowe)
+    return query
+
+def count_segment(salon_id, filters):
+    """Ile klientek pasuje do filtrów (COUNT w bazie, bez pobierania wierszy)."""
+    try:
+        query = db.active_only(db.get_client().table("klientki").select("id", count="exact", head=True).eq("salon_id", salon_id))
+        return db.run_query(_apply_filters(query, filters), "count_segment").count or 0
+    except Exception:
+        return 0
+
+def fetch_segment(salon_id, filters, columns=SEGMENT_COLUMNS, page_size=SEGMENT_PAGE_SIZE):
+    """Pasujące klientki (tylko podane kolumny), stronami po id - jak get_clients_page."""
+    columns = tuple(columns) if "id" in columns else ("id",) + tuple(columns)
+    pages, after_id = [], None
+    try:
+        while True:
+            query = db.active_only(db.get_client().table("klientki").select(*columns).eq("salon_id", salon_id))
+            if after_id is not None: query = query.gt("id", after_id)
+            data = db.run_query(_apply_filters(query, filters).order("id").limit(page_size), "fetch_segment").data
+            if data: pages.extend(data)
+            if len(data) < page_size: break
+            after_id = data[-1]["id"]
+    except Exception:
+        return pd.DataFrame(columns=list(columns))
+    return pd.DataFrame(pages, columns=list(columns))
+
+def segment_ids(salon_id, filters):
+    """Lista id pasujących klientek i ich liczba: (ids, count)."""
+    ids = fetch_segment(salon_id, filters, columns=("id",))["id"].tolist()
+    return ids, len(ids)
+
+def describe(filters):
+    """Krótki opis segmentu do interfejsu, np. 'zabieg: hybryd · ponad 60 dni · +48'."""
+    opis = []
+    if (filters.get("zabieg") or "").strip(): opis.append(f"zabieg: {filters['zabieg'].strip()}")
+    if filters.get("nie_bylo_dni"):
+        opis.append(f"ponad {filters['nie_bylo_dni']} dni" + (" (lub brak daty)" if filters.get("bez_daty") else ""))
+    if filters.get("kierunkowe"): opis.append(", ".join("+" + k for k in filters["kierunkowe"]))
+    return " · ".join(opis) or "wszystkie klientki"
+
+# --- ZAPISANE SEGMENTY ---
+
+def list_segments(salon_id):
+    """Zapisane segmenty salonu: lista słowników {id, nazwa, filtry}."""
+    try:
+        res = db.run_query(db.get_client().table("segmenty").select("id, nazwa, filtry").eq("salon_id", salon_id).order("nazwa"), "list_segments")
+        return res.data or []
+    except Exception:
+        return []
+
+def save_segment(salon_id, nazwa, filters):
+    nazwa = (nazwa or "").strip()
+    if not nazwa: return False, "Podaj nazwę segmentu."
+    try:
+        db.run_query(db.get_client().table("segmenty").upsert(
+            {"salon_id": salon_id, "nazwa": nazwa, "filtry": filters}, on_conflict="salon_id,nazwa"
+        ), "save_segment")
+        return True, f"Zapisano segment '{nazwa}'"
+    except Exception as e:
+        return False, str(e)
+
+def delete_segment(segment_id, salon_id):
+    try:
+        db.run_query(db.get_client().table("segmenty").delete().eq("id", segment_id).eq("salon_id", salon_id), "delete_segment")
+        return True, "Usunięto segment"
+    except Exception as e:
+        return False, str(e)
@@ -1,18 +1,34 @@
 import streamlit as st
-import google.generativeai as genai
 import pandas as pd
+import re
 import time
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# --- IMPORT BIBLIOTEKI SMS ---
-try:
-    from smsapi.client import SmsApiPlClient
-except ImportError:
-    SmsApiPlClient = None 
+import gsm7
+import phones
+import resilience
+import vcf
+from progress import ProgressReporter
+from content_cache import ContentCache, count_lookups, make_key
+from metrics import metrics, bind, campaign_scope
 
-# --- KONFIGURACJA AI ---
-def init_ai():
+# --- LENIWE ZASOBY (Gemini, SMSAPI) ---
+# google.generativeai to ponad sekunda importu, a potrzebny jest dopiero w "Automacie SMS".
+# SDK importujemy i konfigurujemy przy pierwszym użyciu, raz na proces (st.cache_resource).
+# Ustawienie `model` / `SmsApiPlClient` (np. atrapy w benchmarkach) ma pierwszeństwo.
+model = None
+SmsApiPlClient = None
+
+@st.cache_resource(show_spinner=False)
+def get_model():
+    """Model Gemini albo None, gdy w secrets nie ma GOOGLE_API_KEY."""
     try:
         if "GOOGLE_API_KEY" in st.secrets:
+            import google.generativeai as genai
             genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
             return genai.GenerativeModel('gemini-2.0-flash')
         else:
@@ -21,61 +37,155 @@ def init_ai():
         st.error(f"❌ Błąd Gemini: {e}")
         return None
 
-model = init_ai()
+def _model():
+    return model if model is not None else get_model()
+
+def _smsapi_class():
+    """Klasa SmsApiPlClient (import przy pierwszym użyciu) albo None, gdy biblioteki nie ma."""
+    global SmsApiPlClient
+    if SmsApiPlClient is None:
+        try:
+            from smsapi.client import SmsApiPlClient
+        except ImportError:
+            return None
+    return SmsApiPlClient
+
+# --- CACHE TREŚCI AI ---
+def init_content_cache():
+    """Cache wygenerowanych SMS-ów. Jeśli w secrets jest SMS_CACHE_PATH - również na dysku (SQLite)."""
+    try:
+        db_path = st.secrets.get("SMS_CACHE_PATH")
+    except Exception:
+        db_path = None
+    return ContentCache(db_path=db_path)
+
+content_cache = init_content_cache()
 
 # --- FUNKCJE POMOCNICZE ---
+# Tekst zwracany zamiast treści, gdy Gemini zawiedzie - NIGDY nie może pójść jako SMS
+AI_ERROR_PREFIX = "BLAD AI"
+
+def is_ai_error(text):
+    """Czy to pusta treść albo komunikat błędu AI zamiast SMS-a."""
+    return not isinstance(text, str) or not text.strip() or text.startswith(AI_ERROR_PREFIX)
+
 def usun_ogonki(tekst):
-    """Usuwa polskie znaki."""
+    """Usuwa polskie znaki (i wszystko spoza alfabetu GSM-7) - jednym przejściem, patrz gsm7.py."""
     if not isinstance(tekst, str): return ""
-    mapa = {'ą': 'a', 'ć': 'c', 'ę': 'e', 'ł': 'l', 'ń': 'n', 'ó': 'o', 'ś': 's', 'ź': 'z', 'ż': 'z',
-            'Ą': 'A', 'Ć': 'C', 'Ę': 'E', 'Ł': 'L', 'Ń': 'N', 'Ó': 'O', 'Ś': 'S', 'Ź': 'Z', 'Ż': 'Z'}
-    for pl, latin in mapa.items():
-        tekst = tekst.replace(pl, latin)
-    return tekst
+    return gsm7.to_gsm7(tekst)
 
 def parse_vcf(file_content):
-    try:
-        content = file_content.decode("utf-8")
-    except UnicodeDecodeError:
-        content = file_content.decode("latin-1")
-    contacts = []
-    current_contact = {}
-    for line in content.splitlines():
-        if line.startswith("BEGIN:VCARD"):
-            current_contact = {}
-        elif line.startswith("FN:") or line.startswith("N:"): 
-            if "Imię" not in current_contact:
-                parts = line.split(":", 1)[1]
-                current_contact["Imię"] = parts.replace(";", " ").strip()
-        elif line.startswith("TEL"): 
-            if "Telefon" not in current_contact: 
-                number = line.split(":", 1)[1]
-                clean_number = ''.join(filter(str.isdigit, number))
-                if len(clean_number) > 9 and clean_number.startswith("48"): pass
-                elif len(clean_number) == 9: clean_number = "48" + clean_number 
-                current_contact["Telefon"] = clean_number
-        elif line.startswith("END:VCARD"):
-            if "Imię" in current_contact and "Telefon" in current_contact:
-                current_contact["Ostatni Zabieg"] = "Brak"
-                contacts.append(current_contact)
-    return pd.DataFrame(contacts)
-
-def generate_sms_content(salon_name, client_data, campaign_goal, generate_template=False):
-    """Generuje treść SMS (Unikalną lub Szablon)"""
+    """
+    Plik VCF (bajty albo plik) -> DataFrame z kolumnami Imię, Telefon (pełny numer z '+'), Ostatni Zabieg.
+    '+' zostaje, bo importer normalizuje numer jeszcze raz - bez niego +44... dostałby kierunkowy 48.
+    Numery, które nie przeszły walidacji, zostają w oryginalnej postaci.
+    """
+    imiona, telefony = vcf.parse_vcf_columns(file_content)
+    raw = pd.Series(telefony, dtype=object)
+    norm = phones.normalize_phones(raw)
+    telefon = ("+" + norm["e164"]).where(norm["valid"], raw)
+    return pd.DataFrame({"Imię": imiona, "Telefon": telefon, "Ostatni Zabieg": "Brak"})
+
+def _normalize_phone_columns(df):
+    """Normalizuje w miejscu kolumny telefon/kierunkowy; zwraca serię 'czy numer poprawny'."""
+    if "telefon" not in df.columns: return pd.Series(True, index=df.index)
+    norm = phones.normalize_phones(df["telefon"], df.get("kierunkowy"))
+    df["telefon"] = norm["telefon"]
+    if "kierunkowy" in df.columns: df["kierunkowy"] = norm["kierunkowy"]
+    return norm["valid"]
+
+def changed_client_rows(original_df, edited_df, columns=("imie", "telefon", "kierunkowy", "ostatni_zabieg")):
+    """
+    Porównuje wynik st.data_editor z oryginalnie wczytaną tabelą (po kolumnie 'id')
+    i zwraca tylko wiersze, w których coś się zmieniło. Telefon jest już znormalizowany
+    (kierunkowy + numer krajowy), a kolumna 'telefon_ok' oznacza numery, które nie przeszły walidacji.
+    """
+    cols = [c for c in columns if c in edited_df.columns]
+    if edited_df.empty or not cols:
+        return edited_df.iloc[0:0]
+
+    edited = edited_df.set_index("id")[cols].copy()
+    telefon_ok = _normalize_phone_columns(edited)
+    # Oryginał normalizujemy tak samo - inaczej numer zapisany po staremu ("500 600 700")
+    # wyglądałby na zmieniony i był nadpisywany przy każdym zapisie, choć nikt go nie ruszał
+    original = original_df.set_index("id").reindex(edited.index)[cols].copy()
+    _normalize_phone_columns(original)
+
+    # Porównujemy jako tekst, żeby None/NaN/"" nie dawały fałszywych różnic
+    changed_mask = (edited.fillna("").astype(str) != original.fillna("").astype(str)).any(axis=1)
+    edited["telefon_ok"] = telefon_ok
+    return edited[changed_mask].reset_index()
+
+# FILTR ZABIEGÓW
+ZAKAZANE_ZABIEGI = ['importowany', 'brak', 'nieznany', 'nan', 'none', '']
+
+def _znany_zabieg(client_data):
+    """Zwraca nazwę ostatniego zabiegu albo None, gdy to 'Brak'/'Importowany'/puste."""
+    raw_zabieg = str(client_data.get('ostatni_zabieg', '')).strip()
+    return None if raw_zabieg.lower() in ZAKAZANE_ZABIEGI else raw_zabieg
+
+def _instrukcja_zabieg(client_data):
+    raw_zabieg = _znany_zabieg(client_data)
+    if raw_zabieg is None:
+        return "Nie wspominaj o ostatnim zabiegu, bo nie wiemy co to było. Skup się tylko na celu wiadomości."
+    return f"Możesz (ale nie musisz) luźno nawiązać do ostatniego zabiegu: {raw_zabieg}."
+
+def _pierwsze_imie(imie):
+    czesci = usun_ogonki(str(imie)).split()
+    return czesci[0] if czesci else ""
+
+def _do_szablonu(text, imie):
+    """
+    Zamienia imię klientki w gotowym SMS-ie na {imie}, żeby treść mogła trafić do cache
+    i posłużyć innym osobom z tym samym zabiegiem. Zwraca None, gdy zostaje jakaś część
+    imienia/nazwiska (np. inna odmiana) - takiej treści nie wolno podać innej osobie.
+    """
+    czesci = usun_ogonki(str(imie)).split()
+    if not czesci: return None
+    text = re.sub(re.escape(" ".join(czesci)), "{imie}", text, flags=re.IGNORECASE)
+    text = re.sub(r"\b" + re.escape(czesci[0]) + r"\b", "{imie}", text, flags=re.IGNORECASE)
+    if "{imie}" not in text: return None
+    if any(c.lower() in text.lower() for c in czesci): return None
+    return text
+
+def _cache_key(salon_name, campaign_goal, client_data, generate_template):
+    if generate_template:
+        return make_key("szablon", salon_name, campaign_goal)
+    return make_key("unikalny", salon_name, campaign_goal, _znany_zabieg(client_data))
+
+def _z_cache(key, imie, generate_template):
+    cached = content_cache.get(key)
+    if cached is None or generate_template: return cached
+    return cached.replace("{imie}", _pierwsze_imie(imie))
+
+def _do_cache(key, text, imie, generate_template):
+    szablon = text if generate_template else _do_szablonu(text, imie)
+    if szablon: content_cache.set(key, szablon)
+
+def _ask_model(prompt, name="generate"):
+    """Jedno zapytanie do Gemini z pomiarem (metrics.py) - rozmiar to długość promptu."""
+    with metrics.span(f"gemini.{name}", size=len(prompt)):
+        return _model().generate_content(prompt)
+
+def generate_sms_content(salon_name, client_data, campaign_goal, generate_template=False, raise_errors=False, use_cache=True,
+                         retries=3):
+    """
+    Generuje treść SMS (Unikalną lub Szablon). Z raise_errors=True błąd AI leci wyżej zamiast tekstu 'BLAD AI'.
+    Z use_cache=True identyczne zapytania (salon, cel, zabieg) są obsługiwane z cache zamiast z Gemini.
+    `retries=1` - bez własnych ponowień, gdy ponawia już wywołujący (generate_messages_parallel).
+    """
     
     imie = "{imie}" if generate_template else client_data.get('imie', 'Klientko')
     
-    # FILTR ZABIEGÓW
-    raw_zabieg = str(client_data.get('ostatni_zabieg', '')).strip()
-    zakazane_slowa = ['importowany', 'brak', 'nieznany', 'nan', 'none', '']
-    
-    if raw_zabieg.lower() in zakazane_slowa:
-        instrukcja_zabieg = "Nie wspominaj o ostatnim zabiegu, bo nie wiemy co to było. Skup się tylko na celu wiadomości."
-    else:
-        instrukcja_zabieg = f"Możesz (ale nie musisz) luźno nawiązać do ostatniego zabiegu: {raw_zabieg}."
+    instrukcja_zabieg = _instrukcja_zabieg(client_data)
 
-    if not model: 
+    if not _model(): 
         return usun_ogonki(f"Hej {imie}, zapraszamy do {salon_name}!")
+
+    key = _cache_key(salon_name, campaign_goal, client_data, generate_template)
+    if use_cache:
+        cached = _z_cache(key, imie, generate_template)
+        if cached is not None: return cached
     
     if generate_template:
         instr = f"Użyj znacznika {{imie}} w treści."
@@ -96,74 +206,546 @@ def generate_sms_content(salon_name, client_data, campaign_goal, generate_templa
     """
     
     try:
-        res = model.generate_content(prompt)
+        res = resilience.call_with_retry(_ask_model, prompt, retries=retries)
         text = res.text.strip()
         if generate_template and "{imie}" not in text: text = f"Hej {{imie}}, {text}"
         
-        text_clean = text.encode('ascii', 'ignore').decode('ascii')
-        return usun_ogonki(text_clean)
+        text_clean = usun_ogonki(text)
+        # Do cache tylko treść nadająca się do wysyłki - inaczej zła odpowiedź wracałaby przy każdym pytaniu
+        if use_cache and (generate_template or is_valid_sms(text_clean, imie)):
+            _do_cache(key, text_clean, imie, generate_template)
+        return text_clean
     except Exception as e:
-        return f"BLAD AI: {str(e)}"
+        if raise_errors: raise
+        return f"{AI_ERROR_PREFIX}: {str(e)}"
+
+class PooledSmsClient:
+    """
+    Klient SMSAPI z jedną sesją HTTP (keep-alive) współdzieloną przez wszystkie wątki wysyłki.
+    Biblioteka smsapi-client robi requests.request() przy każdym SMS-ie (nowe połączenie + TLS),
+    więc bierzemy z niej tylko autoryzację i domenę, a POST robimy przez własną pulę połączeń.
+    """
+
+    def __init__(self, token, domain=None, pool_size=None):
+        self.api = _smsapi_class()(access_token=token)
+        if domain: self.api.domain = domain
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size or SMS_MAX_WORKERS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Limit tempa konta SMSAPI jest jeden na token - dzielą go wszystkie równoległe kampanie
+        self.limiter = TokenBucket(SMS_RATE_LIMIT, SMS_BURST)
 
-def send_sms_via_api(phone, message):
+    def send(self, to, message, **params):
+        payload = {"to": to, "message": message, "format": "json", "encoding": "utf-8", **params}
+        # Rozmiar = znaki treści x liczba odbiorców (przy wysyłce zbiorczej)
+        with metrics.span("smsapi.send", size=len(message) * (str(to).count(",") + 1)):
+            res = self.session.post(self.api.domain + "sms.do", data=payload, auth=self.api.auth, timeout=30)
+            try:
+                body = res.json()
+            except ValueError:
+                body = {}
+            if res.status_code >= 400 or body.get("error"):
+                raise resilience.ServiceError(
+                    body.get("message") or res.text or f"HTTP {res.status_code}", res.status_code, body.get("error")
+                )
+            return body
+
+@st.cache_resource(show_spinner=False)
+def get_sms_client(token, domain=None):
+    """Jeden klient na proces (i token) - zamiast nowego przy każdym numerze."""
+    return PooledSmsClient(token, domain)
+
+def _configured_sms_client():
+    """Zwraca (klient, None) albo (None, komunikat błędu), gdy brakuje biblioteki lub tokenu."""
     # ZABEZPIECZENIE: Sprawdzamy czy biblioteka istnieje
-    if SmsApiPlClient is None:
-        return False, "❌ BŁĄD: Biblioteka 'smsapi-client' nie jest zainstalowana!"
+    if _smsapi_class() is None:
+        return None, "❌ BŁĄD: Biblioteka 'smsapi-client' nie jest zainstalowana!"
 
     token = st.secrets.get("SMSAPI_TOKEN", "")
-    if not token: return False, "Brak Tokenu w secrets.toml"
-    
+    if not token: return None, "Brak Tokenu w secrets.toml"
+    return get_sms_client(token, st.secrets.get("SMSAPI_URL")), None
+
+# SMSAPI odrzuca idx, który już był użyty (check_idx=1) - czyli ten SMS już wyszedł.
+# Kod 53 z listy błędów SMSAPI ("nieunikalny parametr idx"). Tylko ten kod - inne błędy
+# dotyczące idx (zła liczba parametrów, za długi idx) oznaczają, że SMS NIE wyszedł.
+SMSAPI_DUPLICATE_IDX_CODE = 53
+
+def _already_sent(e):
+    return getattr(e, "code", None) == SMSAPI_DUPLICATE_IDX_CODE
+
+def _idx_params(keys):
+    """Parametry idempotencji SMSAPI dla listy kluczy (przy wielu odbiorcach rozdzielone '|')."""
+    if not keys or not all(keys): return {}
+    return {"idx": "|".join(keys), "check_idx": 1}
+
+def send_sms_via_api(phone, message, idempotency_key=None, limiter=None):
+    """
+    Wysyła jeden SMS. Błędy chwilowe i limity providera są ponawiane z backoffem (resilience.py);
+    z `idempotency_key` ponowienie nigdy nie wyśle tego samego SMS-a dwa razy.
+    """
+    if is_ai_error(message): return False, "Brak treści (błąd AI) - nie wysłano"
     try:
-        client = SmsApiPlClient(access_token=token)
+        client, error = _configured_sms_client()
+        if error: return False, error
         
-        # --- ZMIANA TUTAJ ---
-        # Usunąłem parametr 'from_=' całkowicie.
-        # Teraz system wyśle SMS "domyślnym" kanałem bez wymuszania nazwy.
-        client.sms.send(to=str(phone), message=message) 
+        # Bez parametru 'from_' - system wyśle SMS "domyślnym" kanałem bez wymuszania nazwy.
+        resilience.call_with_retry(
+            client.send, to=str(phone), message=message, limiter=limiter, **_idx_params([idempotency_key])
+        )
         
         return True, "OK"
     except Exception as e:
+        if idempotency_key and _already_sent(e): return True, "OK (wysłano wcześniej)"
         return False, str(e)
+
+# --- WYSYŁKA RÓWNOLEGŁA ---
+# Limity konta SMSAPI - wysyłamy kilka SMS naraz, ale nie szybciej niż pozwala provider.
+SMS_RATE_LIMIT = 10    # max wiadomości na sekundę
+SMS_BURST = 10         # ile wiadomości może pójść "na raz" po chwili przerwy
+SMS_MAX_WORKERS = 8    # ile równoległych połączeń HTTP
+
+class TokenBucket:
+    """Prosty, wątkowo-bezpieczny limiter: `rate` żetonów na sekundę, maksymalnie `capacity` w zapasie."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blokuje, dopóki nie będzie wolnego żetonu."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+_sms_limiter_lock = threading.Lock()
+
+def _sms_limiter(rate_limit=None, burst=None):
+    """
+    Limiter tempa wysyłki. Bez jawnych limitów - wspólny TokenBucket klienta SMS (jeden na proces
+    i token), więc kilka kampanii naraz nie przekroczy limitu konta, a zapas nie odnawia się co paczkę.
+    """
+    client, error = (None, None) if rate_limit or burst else _configured_sms_client()
+    if client is None: return TokenBucket(rate_limit or SMS_RATE_LIMIT, burst or SMS_BURST)
+    with _sms_limiter_lock:
+        # Atrapy klienta (benchmarki) nie mają własnego limitera - dostają go przy pierwszym użyciu
+        if getattr(client, "limiter", None) is None:
+            client.limiter = TokenBucket(SMS_RATE_LIMIT, SMS_BURST)
+        return client.limiter
+
+def dispatch_sms(messages, rate_limit=None, burst=None, max_workers=None, on_result=None, keys=None):
+    """
+    Wysyła listę par (telefon, treść) równolegle, z limitem `rate_limit` SMS/s.
+    Gdy SMSAPI zaczyna odrzucać zapytania (limit), liczba równoległych wysyłek sama spada.
+    `keys` - klucze idempotencji (resilience.idempotency_key) w kolejności `messages`.
+    Zwraca listę (sukces, info) w tej samej kolejności co `messages`.
+    `on_result(i, sukces, info)` jest wołane w kolejności wiadomości (do paska postępu).
+    Bez `rate_limit` / `burst` obowiązuje wspólny limit konta (_sms_limiter), a SMS_MAX_WORKERS
+    jest czytane przy każdym wywołaniu.
+    """
+    bucket = _sms_limiter(rate_limit, burst)
+    max_workers = max_workers or SMS_MAX_WORKERS
+    concurrency = resilience.AdaptiveConcurrency(max_workers)
+    keys = keys or [None] * len(messages)
+
+    # Żeton z limitu tempa przy KAŻDEJ próbie (również ponowieniu), nie raz na wiadomość
+    limiter = resilience.Signals(bucket, concurrency)
+
+    def _send(phone, message, key):
+        with concurrency:
+            return send_sms_via_api(phone, message, key, limiter=limiter)
+
+    wyniki = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(bind(_send), phone, message, key) for (phone, message), key in zip(messages, keys)]
+        for i, fut in enumerate(futures):
+            success, info = fut.result()
+            wyniki.append((success, info))
+            if on_result: on_result(i, success, info)
+    return wyniki
+
+# --- GENEROWANIE PACZKAMI (TRYB UNIKALNY) ---
+# Jeden prompt na kilkanaście klientek zamiast jednego na osobę. Model oddaje tablicę JSON,
+# każdą wiadomość sprawdzamy, a tylko te niepoprawne generujemy jeszcze raz pojedynczo.
+GEMINI_BATCH_SIZE = 20
+SMS_MAX_LEN = 150
+
+def is_valid_sms(text, imie=None):
+    """
+    Czy wygenerowany SMS nadaje się do wysyłki: max 150 znaków po zamianie na GSM-7,
+    bez znaków, których nie da się zamienić (emoji), zawiera imię.
+    """
+    if not isinstance(text, str) or not text.strip(): return False
+    if gsm7.unsupported_chars(text): return False
+    text = usun_ogonki(text)
+    if len(text) > SMS_MAX_LEN: return False
+    if imie:
+        pierwsze_imie = usun_ogonki(str(imie)).split()
+        if pierwsze_imie and pierwsze_imie[0].lower() not in text.lower(): return False
+    return True
+
+def _parse_batch_response(text, expected):
+    """Wyciąga listę treści z odpowiedzi modelu (JSON, czasem opakowany w ```json ... ```)."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.lower().startswith("json"): text = text[4:]
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end == -1: return [None] * expected
+
+    try:
+        items = json.loads(text[start:end + 1])
+    except ValueError:
+        return [None] * expected
+
+    wyniki = [None] * expected
+    for pos, item in enumerate(items):
+        if isinstance(item, dict):
+            nr, sms = item.get("nr", pos + 1), item.get("sms")
+        else:
+            nr, sms = pos + 1, item
+        if isinstance(nr, int) and 1 <= nr <= expected and isinstance(sms, str):
+            wyniki[nr - 1] = sms.strip()
+    return wyniki
+
+def generate_sms_batch(salon_name, rows, campaign_goal, raise_errors=False, use_cache=True):
+    """
+    Generuje SMS-y dla kilku klientek jednym zapytaniem do Gemini.
+    Zwraca listę treści w kolejności `rows`; None tam, gdzie odpowiedź nie przeszła walidacji.
+    Klientki, dla których treść jest w cache, w ogóle nie trafiają do promptu.
+    """
+    if not _model():
+        return [generate_sms_content(salon_name, row, campaign_goal) for row in rows]
+
+    keys = [_cache_key(salon_name, campaign_goal, row, False) for row in rows]
+    wyniki = [
+        _z_cache(key, row.get('imie', 'Klientko'), False) if use_cache else None
+        for key, row in zip(keys, rows)
+    ]
+    do_generowania = [i for i, sms in enumerate(wyniki) if sms is None]
+    if not do_generowania: return wyniki
+
+    klientki = [
+        {"nr": n + 1, "imie": str(rows[i].get('imie', 'Klientko')), "ostatni_zabieg": _znany_zabieg(rows[i])}
+        for n, i in enumerate(do_generowania)
+    ]
+
+    prompt = f"""
+    Jesteś recepcjonistką w salonie: {salon_name}.
+    Napisz osobny SMS do każdej klientki z listy. Cel: {campaign_goal}.
+
+    KLIENTKI (JSON):
+    {json.dumps(klientki, ensure_ascii=False)}
+
+    WYTYCZNE (dla każdego SMS-a):
+    1. Zwróć się bezpośrednio do klientki po imieniu.
+    2. Jeśli ostatni_zabieg nie jest null, możesz (ale nie musisz) luźno do niego nawiązać. Jeśli jest null - nie wspominaj o zabiegu.
+    3. Styl: krótki, konkretny, miły.
+    4. BEZWZGLĘDNY ZAKAZ UŻYWANIA EMOJI I IKON (To jest SMS GSM).
+    5. Bez polskich znaków (usuń ogonki).
+    6. Podpisz się: {salon_name}.
+    7. Max {SMS_MAX_LEN} znaków.
+
+    Odpowiedz WYŁĄCZNIE tablicą JSON w formacie: [{{"nr": 1, "sms": "..."}}, ...]
+    """
+
+    try:
+        res = _ask_model(prompt, "generate_batch")
+        kandydaci = _parse_batch_response(res.text, len(do_generowania))
+    except Exception:
+        if raise_errors: raise
+        return wyniki
+
+    for i, sms in zip(do_generowania, kandydaci):
+        imie = rows[i].get('imie')
+        # Polskie znaki da się bezpiecznie zamienić, ale emoji czy za długi tekst - już nie
+        if is_valid_sms(sms, imie):
+            sms = usun_ogonki(sms)
+            wyniki[i] = sms
+            if use_cache: _do_cache(keys[i], sms, imie, False)
+    return wyniki
+
+# --- GENEROWANIE RÓWNOLEGŁE (TRYB UNIKALNY) ---
+# Zamiast time.sleep(0.5) po każdej wiadomości: kilka zapytań do Gemini naraz,
+# a tempo dopasowuje się samo - zwalnia po błędzie limitu (429), przyspiesza po sukcesach.
+GEMINI_RATE_LIMIT = 5      # startowe zapytania na sekundę
+GEMINI_MAX_RATE = 15       # sufit, do którego limiter może przyspieszyć
+GEMINI_MAX_WORKERS = 8
+GEMINI_MAX_RETRIES = 5
+
+class AdaptiveRateLimiter(TokenBucket):
+    """TokenBucket, który po błędzie limitu zmniejsza tempo o połowę, a po sukcesie powoli je podnosi."""
+
+    def __init__(self, rate, min_rate=0.2, max_rate=None, step=0.5):
+        super().__init__(rate, capacity=1)
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate
+        self.step = step
+
+    def on_throttle(self):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0  # chwila przerwy dla wszystkich wątków
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.step)
+
+def generate_messages_parallel(salon_name, rows, campaign_goal, on_progress=None,
+                               rate_limit=None, max_workers=None, batch_size=None):
+    """
+    Generuje unikalne SMS-y dla listy klientek (słowniki / wiersze DataFrame) równolegle,
+    po `batch_size` klientek w jednym prompcie.
+    Zwraca listę treści w kolejności `rows`; None tam, gdzie mimo ponowień nie udało się
+    wygenerować treści (taka osoba nie może dostać SMS-a). `on_progress(gotowe, wszystkie)` - postęp.
+    """
+    # Domyślne limity z GEMINI_* czytamy przy wywołaniu (benchmark może je podmienić)
+    limiter = AdaptiveRateLimiter(rate_limit or GEMINI_RATE_LIMIT, max_rate=GEMINI_MAX_RATE)
+    max_workers = max_workers or GEMINI_MAX_WORKERS
+    batch_size = batch_size or GEMINI_BATCH_SIZE
+
+    # Jedyna warstwa ponowień dla Gemini w tym trybie - funkcje niżej same nie ponawiają
+    def _with_limiter(fn, *args):
+        return resilience.call_with_retry(fn, *args, retries=GEMINI_MAX_RETRIES, limiter=limiter)
+
+    def _generate_one(row, attempts=2):
+        # Jak w paczce: treść musi przejść is_valid_sms - inaczej jeszcze jedna próba (bez cache), potem None
+        for attempt in range(attempts):
+            try:
+                sms = _with_limiter(lambda: generate_sms_content(
+                    salon_name, row, campaign_goal, raise_errors=True, use_cache=attempt == 0, retries=1
+                ))
+            except Exception:
+                return None
+            if is_valid_sms(sms, row.get('imie')): return sms
+        return None
+
+    def _generate_batch(batch):
+        try:
+            wyniki = _with_limiter(generate_sms_batch, salon_name, batch, campaign_goal, True)
+        except Exception:
+            # Paczka padła mimo ponowień - cała paczka bez treści. Pojedynczo to byłoby
+            # do batch_size kolejnych zapytań do API, które właśnie nie odpowiada.
+            return [None] * len(batch)
+        # Poprawiamy pojedynczo tylko to, co wróciło, ale nie przeszło walidacji
+        return [sms if sms is not None else _generate_one(row) for sms, row in zip(wyniki, batch)]
+
+    batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+    wyniki = [None] * len(batches)
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(bind(_generate_batch), batch): i for i, batch in enumerate(batches)}
+        for fut in as_completed(futures):
+            n = futures[fut]
+            wyniki[n] = fut.result()
+            done += len(batches[n])
+            if on_progress: on_progress(done, len(rows))
+    return [sms for batch_wyniki in wyniki for sms in batch_wyniki]
+
+# --- WYSYŁKA ZBIORCZA (JEDEN SZABLON) ---
+# SMSAPI przyjmuje wiele numerów w jednym requeście, a treść może mieć parametry [%1%]
+# podstawiane osobno dla każdego odbiorcy (param1=wartosc1|wartosc2|...).
+SMS_BULK_SIZE = 100  # ilu odbiorców w jednym requeście
+# Trwałe błędy paczki, przy których warto wysłać pojedynczo: 13 - brak prawidłowych numerów
+# (każdy numer dostanie własny wynik), 53 - część idx już wysłana (pojedynczo wyjdzie reszta)
+SMSAPI_INVALID_NUMBERS_CODE = 13
+SMS_BULK_FALLBACK_CODES = {SMSAPI_INVALID_NUMBERS_CODE, SMSAPI_DUPLICATE_IDX_CODE}
+
+def send_template_bulk(recipients, template_content, bulk_size=SMS_BULK_SIZE, on_result=None, keys=None):
+    """
+    Wysyła szablon do listy par (telefon, imię) paczkami - jeden request na `bulk_size` osób,
+    z {imie} zamienionym na parametr SMSAPI. Paczka jest ponawiana przy błędach chwilowych;
+    jeśli mimo to się wywali, jej odbiorcy idą pojedynczo przez dispatch_sms. Błąd trwały
+    (zła autoryzacja, brak środków) kończy wysyłkę - reszta odbiorców dostaje ten błąd.
+    `keys` - klucze idempotencji odbiorców. Zwraca listę (sukces, info) w kolejności `recipients`.
+    """
+    client, error = _configured_sms_client()
+    if not error and is_ai_error(template_content): error = "Brak treści (błąd AI) - nie wysłano"
+    if error:
+        wyniki = [(False, error)] * len(recipients)
+        if on_result:
+            for i, (success, info) in enumerate(wyniki): on_result(i, success, info)
+        return wyniki
+
+    template_content = usun_ogonki(template_content)
+    recipients = [(phone, usun_ogonki(str(imie))) for phone, imie in recipients]
+    use_param = "{imie}" in template_content
+    message = template_content.replace("{imie}", "[%1%]")
+    bucket = _sms_limiter()
+    keys = keys or [None] * len(recipients)
+    wyniki = []
+
+    for start in range(0, len(recipients), bulk_size):
+        group = recipients[start:start + bulk_size]
+        group_keys = keys[start:start + bulk_size]
+        params = _idx_params(group_keys)
+        if use_param:
+            # '|' rozdziela wartości parametrów, więc nie może wystąpić w imieniu
+            params["param1"] = "|".join(str(imie).replace("|", " ") for _, imie in group)
+
+        try:
+            body = resilience.call_with_retry(
+                client.send, to=",".join(str(phone) for phone, _ in group), message=message,
+                limiter=resilience.Signals(bucket), **params
+            )
+            invalid = {str(x.get("submitted_number") or x.get("number")): x.get("message", "Błędny numer") for x in body.get("invalid_numbers", [])}
+            group_wyniki = [(False, invalid[str(p)]) if str(p) in invalid else (True, "OK") for p, _ in group]
+        except Exception as e:
+            if resilience.classify_error(e) == resilience.PERMANENT and getattr(e, "code", None) not in SMS_BULK_FALLBACK_CODES:
+                # Pojedyncze wysyłki skończyłyby się tak samo - nie ma sensu ich próbować
+                group_wyniki = [(False, str(e))] * (len(recipients) - start)
+            else:
+                group_wyniki = dispatch_sms([
+                    (phone, template_content.replace("{imie}", str(imie))) for phone, imie in group
+                ], keys=group_keys)
+
+        for success, info in group_wyniki:
+            if on_result: on_result(len(wyniki), success, info)
+            wyniki.append((success, info))
+        if len(wyniki) == len(recipients): break
+
+    return wyniki
+
+# --- KOSZT KAMPANII ---
+SMS_SEGMENT_PRICE = 0.16  # zł netto za jedną część SMS (cennik SMSAPI)
+
+def estimate_campaign_cost(messages):
+    """Liczba SMS-ów, części i szacowany koszt dla kolumny (Series) gotowych treści."""
+    segments = gsm7.count_segments_series(gsm7.normalize_series(messages))
+    return {
+        "messages": int(len(messages)),
+        "segments": int(segments.sum()),
+        "cost": round(float(segments.sum()) * SMS_SEGMENT_PRICE, 2),
+    }
+
+def campaign_summary(skipped, saved, cache_stats=None):
+    """Dopisek do podsumowania kampanii: pominięte duplikaty (i ile to oszczędziło) oraz trafienia cache AI."""
+    text = ""
+    if skipped:
+        text += f" Pominięto duplikatów: {skipped} (oszczędność ok. {saved:.2f} zł)."
+    trafienia = (cache_stats or {}).get("hits", 0)
+    wszystkie = trafienia + (cache_stats or {}).get("misses", 0)
+    if wszystkie:
+        text += (f" Cache AI: {trafienia} z {wszystkie} treści "
+                 f"({trafienia / wszystkie:.0%}), zaoszczędzone generowania: {trafienia}.")
+    return text
+
 def send_campaign_logic(target_df, template_content, campaign_goal, is_test, progress_bar, salon_name, unique_mode=False):
-    total = len(target_df)
+    # Wszystkie pomiary wywołań z tej kampanii trafiają do jednej serii (panel statystyk)
+    label = f"{salon_name} {time.strftime('%Y-%m-%d %H:%M:%S')}" + (" (test)" if is_test else "")
+    with campaign_scope(label):
+        return _send_campaign_logic(target_df, template_content, campaign_goal, is_test, progress_bar, salon_name, unique_mode)
+
+def _send_campaign_logic(target_df, template_content, campaign_goal, is_test, progress_bar, salon_name, unique_mode=False):
     status_box = st.empty()
     raport_lista = []
+    rows = []
     
-    for i, (index, row) in enumerate(target_df.iterrows()):
+    # Pełne numery całą kolumną naraz (kierunkowy + telefon), jeśli nie przyszły gotowe
+    if 'full_phone' in target_df.columns:
+        full_phones = target_df['full_phone']
+    else:
+        full_phones = phones.full_numbers(target_df)
+
+    # Ten sam numer wybrany kilka razy (np. import z VCF i z Excela) - wysyłamy tylko raz
+    duplikaty = full_phones.duplicated()
+    full_phones_all = full_phones
+    pominiete = target_df[duplikaty]
+    target_df, full_phones = target_df[~duplikaty], full_phones[~duplikaty]
+    total = len(target_df)
+
+    for index, row in target_df.iterrows():
         imie_klientki = row.get('imie', 'Klientko')
-        
-        telefon = row.get('full_phone')
-        if not telefon:
-             kier = row.get('kierunkowy', '48')
-             tel_base = row.get('telefon', '')
-             telefon = str(kier) + str(tel_base)
-        
-        if unique_mode:
-            final_msg = generate_sms_content(salon_name, row, campaign_goal, generate_template=False)
-            time.sleep(0.5)
-        else:
-            try:
-                final_msg = template_content.replace("{imie}", str(imie_klientki))
-            except:
-                final_msg = template_content
+        telefon = full_phones[index]
 
-        if is_test:
-            status_text = "🧪 Symulacja"
-            status_box.info(f"[{i+1}/{total}] {imie_klientki}: {final_msg}")
-            if not unique_mode: time.sleep(0.05) 
-        else:
-            success, info = send_sms_via_api(telefon, final_msg)
-            status_text = "✅ Wysłano" if success else f"❌ Błąd: {info}"
-            status_box.text(f"[{i+1}/{total}] Przetwarzanie: {imie_klientki}...")
-        
+        rows.append(row)
         raport_lista.append({
             "Imię": imie_klientki,
             "Telefon": telefon,
-            "Treść SMS": final_msg,
-            "Status": status_text
+            "Treść SMS": "",
+            "Części": 0,
+            "Status": "🧪 Symulacja" if is_test else ""
         })
 
-        if total > 0: progress_bar.progress(min((i + 1) / total, 1.0))
+    # 1. TREŚCI - w trybie unikalnym generujemy wszystko przed wysyłką (osobny pasek postępu)
+    cache_stats = {"hits": 0, "misses": 0}
+    if unique_mode:
+        gen_progress = ProgressReporter(total, st.progress(0.0, text="Generowanie treści AI..."), label="Generowanie treści AI:")
+        with count_lookups() as cache_stats:
+            messages = generate_messages_parallel(salon_name, rows, campaign_goal,
+                                                  on_progress=lambda done, _: gen_progress.update(done))
+        gen_progress.finish()
+    else:
+        messages = []
+        for r in raport_lista:
+            try:
+                messages.append(template_content.replace("{imie}", str(r["Imię"])))
+            except:
+                messages.append(template_content)
+
+    # Cała kampania do GSM-7 jednym wektorowym przejściem + liczba części każdego SMS-a
+    messages = gsm7.normalize_series(pd.Series(messages, dtype=object))
+    segments = gsm7.count_segments_series(messages)
+    for r, final_msg, czesci in zip(raport_lista, messages, segments):
+        r["Treść SMS"] = final_msg
+        r["Części"] = int(czesci)
+        # Pusta treść = AI zawiodło mimo ponowień; wysyłka i tak ją odrzuci (send_sms_via_api)
+        if is_ai_error(final_msg): r["Status"] = "❌ Błąd AI - nie wysłano"
+
+    oszczednosc = len(pominiete) * (segments.mean() if total else 0) * SMS_SEGMENT_PRICE
+    if not is_test and total > 0:
+        st.info(f"📊 Do wysłania: {total} SMS, {int(segments.sum())} części, "
+                f"szacowany koszt: {segments.sum() * SMS_SEGMENT_PRICE:.2f} zł")
+
+    # 2. WYSYŁKA - pasek i status odświeżamy najwyżej kilka razy na sekundę (patrz progress.py)
+    send_progress = ProgressReporter(total, progress_bar, status_box, label="Symulacja:" if is_test else "Wysłano:")
+    if is_test:
+        # Symulacja idzie pełnym tempem - nic nie wysyłamy, więc nie ma na co czekać
+        for i, r in enumerate(raport_lista):
+            send_progress.update(i + 1, detail=f"[{i+1}/{total}] {r['Imię']}: {r['Treść SMS']}")
+    else:
+        # Klucz kampanii + numer = idx w SMSAPI: ponowienie nie wyśle nikomu drugiego SMS-a
+        campaign_id = make_key(salon_name, campaign_goal, template_content, time.time())
+        keys = [resilience.idempotency_key(campaign_id, r["Telefon"]) for r in raport_lista]
+
+        def _on_result(i, success, info):
+            raport_lista[i]["Status"] = "✅ Wysłano" if success else f"❌ Błąd: {info}"
+            send_progress.update(i + 1, detail=f"[{i+1}/{total}] Przetwarzanie: {raport_lista[i]['Imię']}...")
+
+        if unique_mode:
+            dispatch_sms(
+                [(r["Telefon"], r["Treść SMS"]) for r in raport_lista],
+                on_result=_on_result,
+                keys=keys
+            )
+        else:
+            send_template_bulk(
+                [(r["Telefon"], r["Imię"]) for r in raport_lista],
+                template_content,
+                on_result=_on_result,
+                keys=keys
+            )
+
+    send_progress.finish()
+
+    for index, row in pominiete.iterrows():
+        raport_lista.append({
+            "Imię": row.get('imie', 'Klientko'),
+            "Telefon": full_phones_all[index],
+            "Treść SMS": "",
+            "Części": 0,
+            "Status": "⏭️ Duplikat (pominięto)"
+        })
 
-    status_box.success("🎉 Kampania zakończona!")
+    status_box.success("🎉 Kampania zakończona!" + campaign_summary(len(pominiete), oszczednosc, cache_stats))
     return pd.DataFrame(raport_lista)
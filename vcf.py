@@ -0,0 +1,123 @@
+import io
+import quopri
+
+# --- PARSER VCARD (STRUMIENIOWY) ---
+# Eksporty książki telefonicznej mają często dziesiątki MB, więc nie dekodujemy całego pliku
+# do jednego stringa: czytamy linia po linii, składamy linie zawinięte (RFC 6350 / vCard 2.1)
+# i od razu zbieramy kolumny pod DataFrame.
+
+def _open_stream(source):
+    """Bajty, string albo plik (np. UploadedFile ze Streamlita) -> strumień binarny."""
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source)
+    if isinstance(source, str):
+        return io.BytesIO(source.encode("utf-8"))
+    # Streamlit trzyma ten sam obiekt pliku między rerunami - czytamy zawsze od początku
+    if hasattr(source, "seek"): source.seek(0)
+    return source
+
+def iter_logical_lines(stream):
+    """
+    Zwraca kolejne linie logiczne vCard (bajty, bez CRLF):
+    - linia zaczynająca się od spacji/tabulatora jest doklejana do poprzedniej (folding),
+    - wartość QUOTED-PRINTABLE zakończona '=' jest kontynuowana w następnej linii (vCard 2.1).
+    """
+    current = None
+    for raw in stream:
+        line = raw.rstrip(b"\r\n")
+        if current is not None:
+            if current.endswith(b"=") and b"QUOTED-PRINTABLE" in current.split(b":", 1)[0].upper():
+                current = current[:-1] + line
+                continue
+            if line[:1] in (b" ", b"\t"):
+                current += line[1:]
+                continue
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+def property_name(line):
+    """Sama nazwa właściwości (b'TEL', b'FN', ...) - tanio, bez parsowania parametrów i wartości."""
+    colon = line.find(b":")
+    if colon == -1: return None
+    semi = line.find(b";", 0, colon)
+    return line[:semi if semi != -1 else colon].rsplit(b".", 1)[-1].upper()
+
+def parse_property(line):
+    """'item1.TEL;TYPE=CELL:+48 500...' -> ('TEL', {'TYPE': {'CELL'}}, wartość jako str)."""
+    if b":" not in line: return None, {}, ""
+    head, value = line.split(b":", 1)
+    parts = head.decode("ascii", "ignore").split(";")
+    name = parts[0].rsplit(".", 1)[-1].upper()
+    if len(parts) == 1:
+        try:
+            return name, {}, value.decode("utf-8")
+        except UnicodeDecodeError:
+            return name, {}, value.decode("latin-1")
+
+    params = {}
+    for p in parts[1:]:
+        if "=" in p:
+            key, val = p.split("=", 1)
+            key = key.upper()
+            val = val.strip('"')
+        else:
+            # vCard 2.1: gołe parametry, np. "TEL;CELL;PREF:" albo ";QUOTED-PRINTABLE"
+            key, val = ("ENCODING", p) if p.upper() in ("QUOTED-PRINTABLE", "BASE64", "8BIT") else ("TYPE", p)
+        params.setdefault(key, set()).update(v.upper() for v in val.split(",") if v)
+
+    if "QUOTED-PRINTABLE" in params.get("ENCODING", set()):
+        value = quopri.decodestring(value)
+
+    charset = next(iter(params.get("CHARSET", {"UTF-8"})))
+    try:
+        text = value.decode(charset)
+    except (LookupError, UnicodeDecodeError):
+        text = value.decode("latin-1")
+    return name, params, text
+
+def _pick_phone(phones):
+    """Z kilku TEL wybiera komórkowy (CELL), potem preferowany (PREF), potem pierwszy."""
+    for wanted in ("CELL", "PREF"):
+        for types, number in phones:
+            if wanted in types: return number
+    return phones[0][1] if phones else None
+
+def _name_from_n(value):
+    """N: Nazwisko;Imię;Drugie;Prefiks;Sufiks -> 'Imię Nazwisko'."""
+    parts = [p.strip() for p in value.split(";")] + [""] * 5
+    return " ".join(p for p in (parts[1], parts[2], parts[0]) if p)
+
+def iter_vcards(source):
+    """Generator kontaktów (imię, surowy numer telefonu) - jeden na każdą kompletną wizytówkę."""
+    fn = n = None
+    phones = []
+    for line in iter_logical_lines(_open_stream(source)):
+        # Pełne parsowanie tylko dla właściwości, których potrzebujemy (reszta to zdjęcia, adresy, ...)
+        name = property_name(line)
+        if name == b"BEGIN":
+            fn = n = None
+            phones = []
+        elif name == b"FN":
+            fn = parse_property(line)[2].strip()
+        elif name == b"N":
+            n = _name_from_n(parse_property(line)[2])
+        elif name == b"TEL":
+            _, params, value = parse_property(line)
+            if value.lower().startswith("tel:"):
+                value = value.split(":", 1)[-1]
+            phones.append((params.get("TYPE", set()), value))
+        elif name == b"END":
+            imie = fn or n
+            telefon = _pick_phone(phones)
+            if imie and telefon:
+                yield imie, telefon
+
+def parse_vcf_columns(source):
+    """Parsuje plik VCF prosto do kolumn: (lista imion, lista surowych numerów)."""
+    imiona, telefony = [], []
+    for imie, telefon in iter_vcards(source):
+        imiona.append(imie)
+        telefony.append(telefon)
+    return imiona, telefony